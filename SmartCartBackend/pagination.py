@@ -0,0 +1,26 @@
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Paginación por cursor sobre el id (único y creciente): cada página es un `WHERE id < cursor
+    ORDER BY id DESC LIMIT n` por el índice de la clave primaria, así que cuesta lo mismo en la
+    primera página que en la última y no se saltea ni repite filas si se insertan otras mientras tanto.
+    """
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class IdTiebreakOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter que agrega el id al final cuando el orden pedido no es único (?ordering=price):
+    sin desempate las filas con el mismo valor cambian de lugar entre consultas y el cursor de
+    IdCursorPagination saltea o repite filas entre páginas.
+    """
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering or any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            return ordering
+        return [*ordering, '-id' if ordering[0].startswith('-') else 'id']
@@ -104,6 +104,22 @@ DATABASES = {
     }
 }
 
+# Con REDIS_URL la caché se comparte entre workers; sin ella cada proceso usa la suya en memoria
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+CACHE_IS_SHARED = bool(os.getenv('REDIS_URL'))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -140,6 +156,13 @@ STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+MEDIA_URL = 'media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Storage de los recibos PDF; sin configurar se usa el storage por defecto (MEDIA_ROOT).
+# Ejemplo: {'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': '/data/invoices'}}
+INVOICE_STORAGE = None
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -153,7 +176,9 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'SmartCartBackend.pagination.IdCursorPagination',
+    'PAGE_SIZE': 20,
 }
 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -163,11 +188,23 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
+# Bandeja de salida: como máximo N correos por destinatario en cada ventana de tantos segundos
+EMAIL_OUTBOX_MAX_PER_RECIPIENT = int(os.getenv('EMAIL_OUTBOX_MAX_PER_RECIPIENT', 20))
+EMAIL_OUTBOX_RATE_WINDOW = int(os.getenv('EMAIL_OUTBOX_RATE_WINDOW', 3600))
+
+# Por debajo de este stock un producto entra en el resumen de `send_low_stock_digest`
+LOW_STOCK_THRESHOLD = int(os.getenv('LOW_STOCK_THRESHOLD', 5))
 
 STRIPE_PUBLIC_KEY = os.environ.get('STRIPE_PUBLIC_KEY')
 STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
 STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
 
+# Segundos que un worker reutiliza su índice de nombres de producto para voz antes de reconstruirlo
+VOICE_INDEX_TTL = int(os.environ.get('VOICE_INDEX_TTL', 300))
+# Modo aproximado de voz: distancia de edición máxima por palabra y puntaje mínimo para aceptar un producto
+VOICE_FUZZY_MAX_DISTANCE = int(os.environ.get('VOICE_FUZZY_MAX_DISTANCE', 2))
+VOICE_FUZZY_MIN_SCORE = float(os.environ.get('VOICE_FUZZY_MIN_SCORE', 0.6))
+
 CORS_ALLOWED_ORIGINS = [
     "https://pos-frontend-production-fd0d.up.railway.app",
     "https://clever-cart-craft-production.up.railway.app",
@@ -3,9 +3,9 @@ from django.urls import path, include
 from rest_framework import routers
 from users.views import RolViewSet, UsuarioViewSet, CustomPasswordResetView, LogoutView, PasswordResetConfirmView, \
     RegisterClienteView, RegisterDeliveryView, UserProfileView
-from products.views import ProductViewSet
+from products.views import ProductViewSet, ReportJobViewSet
 from orders.views import OrderViewSet, OrderItemViewSet, CartViewSet, CartItemViewSet, CheckoutView, StripeWebhookView, \
-    VoiceCartProcessingView
+    VoiceCartProcessingView, ClientMetricsViewSet
 from rest_framework.authtoken.views import obtain_auth_token
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
@@ -23,6 +23,8 @@ router.register(r'orders', OrderViewSet, basename='order')
 router.register(r'order-items', OrderItemViewSet, basename='orderitem')
 router.register(r'cart', CartViewSet, basename="cart")
 router.register(r'cart-items', CartItemViewSet, basename="cart-items")
+router.register(r'report-jobs', ReportJobViewSet, basename='report-job')
+router.register(r'client-metrics', ClientMetricsViewSet, basename='client-metrics')
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from .models import Order, OrderItem, Cart, StripeEvent, ClientMetrics
 from .models import OrderStatusHistory
 
 admin.site.register(Order)
@@ -10,3 +10,32 @@ admin.site.register(OrderItem)
 class OrderStatusHistoryAdmin(admin.ModelAdmin):
     list_display = ('order', 'previous_status', 'new_status', 'changed_at')
     list_filter = ('previous_status', 'new_status', 'changed_at')
+
+
+@admin.register(Cart)
+class CartAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'created_at', 'cart_total')
+    search_fields = ('user__correo',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_total().select_related('user')
+
+    @admin.display(description='Total', ordering='cart_total')
+    def cart_total(self, obj):
+        return obj.cart_total
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'event_type', 'status', 'attempts', 'next_attempt_at', 'order', 'created_at')
+    list_filter = ('status', 'event_type')
+    search_fields = ('event_id',)
+    readonly_fields = ('payload',)
+
+
+@admin.register(ClientMetrics)
+class ClientMetricsAdmin(admin.ModelAdmin):
+    list_display = ('client', 'segment', 'rfm_score', 'frequency', 'monetary', 'lifetime_value', 'recency_days')
+    list_filter = ('segment',)
+    search_fields = ('client__correo',)
+    list_select_related = ('client',)
@@ -0,0 +1,71 @@
+import csv
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+class _Echo:
+    """csv.writer necesita un archivo; este solo devuelve lo que se le escribe."""
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(fields, rows, batch=500):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow(row))
+        if len(buffer) >= batch:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def ndjson_chunks(fields, rows, batch=500):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    buffer = []
+    for row in rows:
+        buffer.append(encoder.encode(dict(zip(fields, row))) + '\n')
+        if len(buffer) >= batch:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def streaming_export(fields, rows, export_format, filename, compress=False):
+    """
+    Respuesta que va escribiendo `rows` (un iterable perezoso, idealmente un .iterator() sobre
+    values_list) a medida que el cliente lee: memoria constante y el primer byte sale enseguida.
+    Con `compress` el archivo se entrega como .gz.
+    """
+    content_type, extension = EXPORT_FORMATS[export_format]
+    chunks = csv_chunks(fields, rows) if export_format == 'csv' else ndjson_chunks(fields, rows)
+
+    if compress:
+        response = StreamingHttpResponse(gzip_chunks(chunks), content_type='application/gzip')
+        extension += '.gz'
+    else:
+        response = StreamingHttpResponse((chunk.encode('utf-8') for chunk in chunks), content_type=content_type)
+
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
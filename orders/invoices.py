@@ -0,0 +1,78 @@
+import hashlib
+import json
+
+from django.core.files.base import ContentFile
+from django.db.models import DecimalField
+from django.db.models.functions import Coalesce
+
+from .models import Invoice, OrderItem
+from .utils import render_invoice_pdf
+
+
+def _sold_price():
+    # las líneas cargadas fuera de place_order_from_cart (admin, filas viejas) no guardan el precio
+    return Coalesce('unit_price', 'product__price', output_field=DecimalField(max_digits=10, decimal_places=2))
+
+
+def _invoice_data(order, lines):
+    """`lines` son (product_id, nombre, cantidad, precio unitario de la venta)."""
+    return {
+        'order_id': order.id,
+        'client_name': f"{order.client.nombre} {order.client.apellido}",
+        'client_email': order.client.correo,
+        'date': order.created_at.strftime('%d/%m/%Y'),
+        'items': [(name, quantity, unit_price) for _, name, quantity, unit_price in lines],
+        'lines': [(product_id, quantity, unit_price) for product_id, _, quantity, unit_price in lines],
+    }
+
+
+def build_invoice_data(order):
+    lines = list(order.items.order_by('id').values_list('product_id', 'product__name', 'quantity', _sold_price()))
+    return _invoice_data(order, lines)
+
+
+def build_invoice_data_bulk(orders):
+    """Datos de varios recibos con una consulta para las órdenes y otra para todas sus líneas."""
+    orders = list(orders.select_related('client'))
+    lines = {}
+    for order_id, product_id, name, quantity, unit_price in (
+        OrderItem.objects.filter(order__in=orders).order_by('order_id', 'id')
+        .values_list('order_id', 'product_id', 'product__name', 'quantity', _sold_price())
+    ):
+        lines.setdefault(order_id, []).append((product_id, name, quantity, unit_price))
+    return [_invoice_data(order, lines.get(order.id, [])) for order in orders]
+
+
+def content_hash(data):
+    """
+    Hash de lo que la orden tiene guardado (líneas con el precio de la venta). Los datos vivos
+    del producto o del cliente no entran, así que editar un producto no reescribe recibos viejos.
+    """
+    stored = {'order_id': data['order_id'], 'date': data['date'], 'lines': data['lines']}
+    return hashlib.sha256(json.dumps(stored, default=str, sort_keys=True).encode()).hexdigest()
+
+
+def save_invoice(order_id, data_hash, pdf, invoice=None):
+    if invoice is None:
+        invoice = Invoice(order_id=order_id)
+    elif invoice.file:
+        invoice.file.delete(save=False)
+    invoice.content_hash = data_hash
+    invoice.file.save(f"{data_hash}.pdf", ContentFile(pdf), save=False)
+    invoice.save()
+    return invoice
+
+
+def get_or_render_invoice(order, data=None):
+    """
+    Devuelve el recibo guardado de la orden. Solo se vuelve a dibujar si no existe o si cambió
+    lo que muestra (el hash de su contenido ya no coincide).
+    """
+    if data is None:
+        data = build_invoice_data(order)
+    data_hash = content_hash(data)
+
+    invoice = Invoice.objects.filter(order=order).first()
+    if invoice is not None and invoice.content_hash == data_hash and invoice.file.storage.exists(invoice.file.name):
+        return invoice
+    return save_invoice(order.id, data_hash, render_invoice_pdf(data), invoice)
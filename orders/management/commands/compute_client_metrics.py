@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.client_metrics import refresh_client_metrics
+
+
+class Command(BaseCommand):
+    help = 'Recalcula la segmentación RFM y el valor de vida de todos los clientes (ClientMetrics).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = refresh_client_metrics(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{count} clientes actualizados en {time.perf_counter() - started:.1f} s.'
+        ))
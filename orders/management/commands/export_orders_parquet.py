@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Exporta órdenes, líneas e historial de estados a Parquet particionado por mes, '
+            'solo con lo nuevo o modificado desde la corrida anterior.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', help='Directorio del dataset (se crea si no existe)')
+        parser.add_argument('--chunk-size', type=int, default=50_000)
+        parser.add_argument('--lag', type=int, default=60,
+                            help='Segundos de margen: no se exportan filas más recientes que esto')
+
+    def handle(self, *args, **options):
+        try:
+            from orders.parquet_export import export_orders_parquet
+        except ImportError as e:
+            raise CommandError(f'Falta una dependencia para exportar a Parquet (pyarrow): {e}')
+
+        exported = export_orders_parquet(
+            options['output_dir'], timedelta(seconds=options['lag']), options['chunk_size']
+        )
+        for table, rows in exported.items():
+            self.stdout.write(f'{table}: {rows} filas')
@@ -0,0 +1,41 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from orders.stripe_events import claim_events, process_event
+
+
+class Command(BaseCommand):
+    help = 'Procesa los eventos de Stripe guardados por el webhook, con reintentos y backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Eventos procesados en paralelo')
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--max-attempts', type=int, default=5,
+                            help='Intentos antes de marcar el evento como fallido')
+        parser.add_argument('--backoff', type=int, default=30,
+                            help='Segundos de espera tras el primer fallo; se duplica en cada intento')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Segundos de espera cuando no hay eventos pendientes')
+        parser.add_argument('--once', action='store_true', help='Procesa lo pendiente y termina')
+
+    def handle(self, *args, **options):
+        def run(event_id):
+            try:
+                process_event(event_id, options['max_attempts'], options['backoff'])
+            finally:
+                # cada hilo tiene su propia conexión
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                ids = claim_events(options['batch_size'])
+                if ids:
+                    list(executor.map(run, ids))
+                    self.stdout.write(f'{len(ids)} eventos procesados')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from orders.order_stats import rebuild_order_stats
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero los acumulados de órdenes por cliente (ClientOrderStats).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = rebuild_order_stats(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Acumulados reconstruidos para {count} clientes.'))
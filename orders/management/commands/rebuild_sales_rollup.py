@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.services import rebuild_daily_sales
+from products.analytics import bump_sales_analytics_version
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye ProductDailySales a partir de las órdenes (todo el historial o un rango de días).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='Primer día a reconstruir (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Último día a reconstruir (YYYY-MM-DD)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            start = datetime.strptime(options['start'], '%Y-%m-%d').date() if options['start'] else None
+            end = datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end'] else None
+        except ValueError:
+            raise CommandError('Formato de fecha inválido. Use YYYY-MM-DD.')
+
+        written = rebuild_daily_sales(start, end, options['batch_size'])
+        bump_sales_analytics_version()
+        self.stdout.write(self.style.SUCCESS(f'{written} filas de ventas diarias reconstruidas.'))
@@ -0,0 +1,44 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from orders.invoices import build_invoice_data_bulk, content_hash, save_invoice
+from orders.models import Order, Invoice
+from orders.utils import render_invoice_pdf
+
+
+class Command(BaseCommand):
+    help = 'Genera en lote los recibos PDF que faltan (o todos con --force) usando varios procesos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Procesos para dibujar los PDF (por defecto, uno por núcleo)')
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--force', action='store_true',
+                            help='Vuelve a generar también los recibos que ya existen')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.order_by('id')
+        if not options['force']:
+            orders = orders.filter(invoice__isnull=True)
+        order_ids = list(orders.values_list('id', flat=True))
+        batch_size = options['batch_size']
+
+        # los procesos hijos no deben heredar la conexión abierta del padre
+        connections.close_all()
+
+        rendered = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            for start in range(0, len(order_ids), batch_size):
+                batch = order_ids[start:start + batch_size]
+                data = build_invoice_data_bulk(Order.objects.filter(id__in=batch).order_by('id'))
+                existing = {invoice.order_id: invoice for invoice in Invoice.objects.filter(order_id__in=batch)}
+
+                for item, pdf in zip(data, executor.map(render_invoice_pdf, data, chunksize=16)):
+                    save_invoice(item['order_id'], content_hash(item), pdf, existing.get(item['order_id']))
+                    rendered += 1
+
+                self.stdout.write(f'{rendered}/{len(order_ids)} recibos generados')
+
+        self.stdout.write(self.style.SUCCESS(f'{rendered} recibos generados.'))
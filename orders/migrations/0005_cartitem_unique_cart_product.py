@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-18 04:57
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_cart_items(apps, schema_editor):
+    CartItem = apps.get_model('orders', 'CartItem')
+    duplicates = (
+        CartItem.objects.values('cart_id', 'product_id')
+        .annotate(lines=Count('id'), total=Sum('quantity'))
+        .filter(lines__gt=1)
+    )
+    for duplicate in duplicates:
+        items = CartItem.objects.filter(
+            cart_id=duplicate['cart_id'], product_id=duplicate['product_id']
+        ).order_by('id')
+        keep = items.first()
+        items.exclude(pk=keep.pk).delete()
+        CartItem.objects.filter(pk=keep.pk).update(quantity=duplicate['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_alter_order_status_cart_cartitem'),
+        ('products', '0003_product_discount_percentage_product_has_discount_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cart_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='unique_cart_product'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-18 05:00
+
+import django.db.models.deletion
+import orders.models
+import orders.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_stripeevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Invoice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('file', models.FileField(storage=orders.utils.get_invoice_storage, upload_to=orders.models.invoice_upload_to)),
+                ('rendered_at', models.DateTimeField(auto_now=True)),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='invoice', to='orders.order')),
+            ],
+        ),
+    ]
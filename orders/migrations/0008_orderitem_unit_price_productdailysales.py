@@ -0,0 +1,52 @@
+# Generated by Django 5.2 on 2026-10-18 05:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, F, OuterRef, Subquery, When
+from django.db.models.functions import Round
+
+
+def backfill_unit_price(apps, schema_editor):
+    # el precio al momento de la venta no se guardaba; el mejor dato disponible es el precio actual
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    Product = apps.get_model('products', 'Product')
+    final_price = Case(
+        When(has_discount=True, discount_percentage__gt=0,
+             then=Round(F('price') - F('price') * F('discount_percentage') / 100, 2)),
+        default=F('price'),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+    )
+    OrderItem.objects.filter(unit_price__isnull=True).update(unit_price=Subquery(
+        Product.objects.filter(pk=OuterRef('product_id')).annotate(final=final_price).values('final')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_invoice'),
+        ('products', '0004_product_low_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.CreateModel(
+            name='ProductDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='product_daily_sales_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'day'), name='unique_product_day_sales')],
+            },
+        ),
+        migrations.RunPython(backfill_unit_price, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def copy_created_at(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    Order.objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_order_created_at_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['updated_at', 'id'], name='order_updated_at_idx'),
+        ),
+    ]
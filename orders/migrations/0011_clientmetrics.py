@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-18 05:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_order_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_order_at', models.DateTimeField()),
+                ('last_order_at', models.DateTimeField()),
+                ('recency_days', models.PositiveIntegerField()),
+                ('frequency', models.PositiveIntegerField()),
+                ('monetary', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('average_order_value', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('lifetime_value', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('projected_annual_value', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('recency_score', models.PositiveSmallIntegerField()),
+                ('frequency_score', models.PositiveSmallIntegerField()),
+                ('monetary_score', models.PositiveSmallIntegerField()),
+                ('rfm_score', models.CharField(max_length=3)),
+                ('segment', models.CharField(choices=[('campeones', 'Campeones'), ('leales', 'Leales'), ('potenciales', 'Potenciales'), ('nuevos', 'Nuevos'), ('en_riesgo', 'En riesgo'), ('perdidos', 'Perdidos'), ('regulares', 'Regulares')], max_length=20)),
+                ('computed_at', models.DateTimeField()),
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='metrics', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['segment', '-monetary'], name='client_metrics_segment_idx'), models.Index(fields=['-lifetime_value'], name='client_metrics_ltv_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-18 05:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+
+
+def build_stats(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    ClientOrderStats = apps.get_model('orders', 'ClientOrderStats')
+    rows = Order.objects.values('client_id').annotate(
+        orders=Count('id', filter=~Q(status='cancelada')),
+        cancelled=Count('id', filter=Q(status='cancelada')),
+        spent=Sum('total_price', filter=~Q(status='cancelada')),
+        last_order_at=Max('created_at'),
+    ).order_by()
+    ClientOrderStats.objects.bulk_create([
+        ClientOrderStats(client_id=row['client_id'], order_count=row['orders'], cancelled_count=row['cancelled'],
+                         total_spent=row['spent'] or 0, last_order_at=row['last_order_at'])
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0011_clientmetrics'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientOrderStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('cancelled_count', models.PositiveIntegerField(default=0)),
+                ('total_spent', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('last_order_at', models.DateTimeField(blank=True, null=True)),
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='order_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(build_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 05:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_clientorderstats'),
+        ('products', '0005_reportjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['client', '-id'], name='order_client_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['delivery_user', '-id'], name='order_delivery_id_idx'),
+        ),
+    ]
@@ -1,6 +1,12 @@
+from decimal import Decimal
+
 from django.db import models
+from django.utils import timezone
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from users.models import Usuario
 from products.models import Product
+from .utils import get_invoice_storage
 
 
 class Order(models.Model):
@@ -20,6 +26,17 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendiente')
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    # marca de agua de la exportación incremental; los .update() sobre Order deben actualizarla a mano
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='order_created_at_idx'),
+            models.Index(fields=['updated_at', 'id'], name='order_updated_at_idx'),
+            # listados paginados por cursor de un cliente o de un repartidor
+            models.Index(fields=['client', '-id'], name='order_client_id_idx'),
+            models.Index(fields=['delivery_user', '-id'], name='order_delivery_id_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.id} - {self.client.correo}"
@@ -39,21 +56,134 @@ class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
+    # precio final cobrado al momento de la venta; no cambia si después cambia el producto
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
 
     def __str__(self):
         return f"{self.quantity}x {self.product.name} (Order {self.order.id})"
 
+    @property
+    def sold_price(self):
+        # las líneas cargadas fuera de place_order_from_cart (admin, filas viejas) no guardan el precio
+        return self.unit_price if self.unit_price is not None else self.product.price
+
+
+class ProductDailySales(models.Model):
+    """Ventas por producto y día, mantenidas al crear cada orden; los reportes de ventas leen de acá."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    day = models.DateField()
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day'], name='unique_product_day_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='product_daily_sales_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.day}: {self.units}"
+
+
+class ClientOrderStats(models.Model):
+    """
+    Acumulados de órdenes por cliente, mantenidos con F() al crear, cambiar el total o cancelar
+    una orden (ver orders.order_stats). Las canceladas no suman al conteo ni al gasto.
+    """
+    client = models.OneToOneField(Usuario, on_delete=models.CASCADE, related_name='order_stats')
+    order_count = models.PositiveIntegerField(default=0)
+    cancelled_count = models.PositiveIntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    last_order_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.client_id}: {self.order_count} órdenes, {self.total_spent}"
+
+
+class ClientMetrics(models.Model):
+    """Segmentación RFM y valor de vida por cliente; la recalcula `compute_client_metrics`."""
+    SEGMENTS = (
+        ('campeones', 'Campeones'),
+        ('leales', 'Leales'),
+        ('potenciales', 'Potenciales'),
+        ('nuevos', 'Nuevos'),
+        ('en_riesgo', 'En riesgo'),
+        ('perdidos', 'Perdidos'),
+        ('regulares', 'Regulares'),
+    )
+
+    client = models.OneToOneField(Usuario, on_delete=models.CASCADE, related_name='metrics')
+    first_order_at = models.DateTimeField()
+    last_order_at = models.DateTimeField()
+    recency_days = models.PositiveIntegerField()
+    frequency = models.PositiveIntegerField()
+    monetary = models.DecimalField(max_digits=14, decimal_places=2)
+    average_order_value = models.DecimalField(max_digits=12, decimal_places=2)
+    # gasto histórico y gasto anual proyectado con la frecuencia y el ticket promedio del cliente
+    lifetime_value = models.DecimalField(max_digits=14, decimal_places=2)
+    projected_annual_value = models.DecimalField(max_digits=14, decimal_places=2)
+    recency_score = models.PositiveSmallIntegerField()
+    frequency_score = models.PositiveSmallIntegerField()
+    monetary_score = models.PositiveSmallIntegerField()
+    rfm_score = models.CharField(max_length=3)
+    segment = models.CharField(max_length=20, choices=SEGMENTS)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['segment', '-monetary'], name='client_metrics_segment_idx'),
+            models.Index(fields=['-lifetime_value'], name='client_metrics_ltv_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.client_id} {self.rfm_score} ({self.segment})"
+
+
+def cart_line_total():
+    return ExpressionWrapper(
+        F('quantity') * F('product__final_price'),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def _sum_or_zero(expression):
+    return Coalesce(expression, Value(Decimal('0')), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+class CartQuerySet(models.QuerySet):
+    def with_total(self):
+        """Anota `cart_total` (suma de las líneas con descuento) calculado en la base de datos."""
+        line_totals = (
+            CartItem.objects.filter(cart=OuterRef('pk'))
+            .values('cart')
+            .annotate(total=Sum(cart_line_total()))
+            .values('total')
+        )
+        return self.annotate(cart_total=_sum_or_zero(Subquery(line_totals)))
+
+    def with_items(self):
+        return self.prefetch_related(
+            models.Prefetch('items', queryset=CartItem.objects.select_related('product'))
+        )
+
 
 class Cart(models.Model):
     user = models.OneToOneField(Usuario, on_delete=models.CASCADE, related_name='cart')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CartQuerySet.as_manager()
+
     def __str__(self):
         return f"Carrito de {self.user.correo}"
 
     @property
     def total_price(self):
-        return sum(item.product.final_price * item.quantity for item in self.items.all())
+        # usa la anotación de Cart.objects.with_total() si está; si no, una sola consulta agregada
+        if hasattr(self, 'cart_total'):
+            return self.cart_total
+        return self.items.aggregate(total=_sum_or_zero(Sum(cart_line_total())))['total']
 
 
 class CartItem(models.Model):
@@ -61,5 +191,53 @@ class CartItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity}x {self.product.name} en carrito de {self.cart.user.correo}"
+
+
+def invoice_upload_to(instance, filename):
+    return f"invoices/{instance.order_id}/{filename}"
+
+
+class Invoice(models.Model):
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='invoice')
+    content_hash = models.CharField(max_length=64)
+    file = models.FileField(upload_to=invoice_upload_to, storage=get_invoice_storage)
+    rendered_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Recibo de la orden {self.order_id}"
+
+
+class StripeEvent(models.Model):
+    STATUS_CHOICES = (
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('procesado', 'Procesado'),
+        ('fallido', 'Fallido'),
+    )
+
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendiente')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='stripe_events')
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='stripe_event_queue_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.quantity}x {self.product.name} en carrito de {self.cart.user.correo}"
\ No newline at end of file
+        return f"{self.event_type} {self.event_id} ({self.status})"
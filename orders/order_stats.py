@@ -0,0 +1,84 @@
+"""
+Acumulados por cliente (ClientOrderStats). Cada cambio se aplica con un UPDATE con F() dentro de la
+transacción que modifica la orden, así que dos órdenes simultáneas del mismo cliente no se pisan.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import ClientOrderStats, Order
+
+CANCELLED = 'cancelada'
+
+
+def apply_order_stats(client_id, orders=0, cancelled=0, spent=Decimal('0'), last_order_at=None, create=True):
+    changes = {
+        'order_count': F('order_count') + orders,
+        'cancelled_count': F('cancelled_count') + cancelled,
+        'total_spent': F('total_spent') + spent,
+    }
+    if last_order_at is not None:
+        changes['last_order_at'] = Greatest(Coalesce(F('last_order_at'), Value(last_order_at)), Value(last_order_at))
+
+    if ClientOrderStats.objects.filter(client_id=client_id).update(**changes) or not create:
+        return
+    try:
+        with transaction.atomic():
+            ClientOrderStats.objects.create(
+                client_id=client_id, order_count=orders, cancelled_count=cancelled,
+                total_spent=spent, last_order_at=last_order_at,
+            )
+    except IntegrityError:
+        # otra transacción creó la fila entre el UPDATE y el INSERT
+        ClientOrderStats.objects.filter(client_id=client_id).update(**changes)
+
+
+def _contribution(state):
+    """Lo que aporta una orden (estado, total) a los acumulados: (órdenes, canceladas, gasto)."""
+    if state is None:
+        return 0, 0, Decimal('0')
+    status, total = state
+    if status == CANCELLED:
+        return 0, 1, Decimal('0')
+    return 1, 0, total
+
+
+def record_order_change(client_id, before=None, after=None, last_order_at=None):
+    """
+    Aplica la diferencia entre la orden antes y después del cambio, cada una como (estado, total)
+    o None si no existe (orden nueva o borrada).
+    """
+    old, new = _contribution(before), _contribution(after)
+    orders, cancelled, spent = (n - o for n, o in zip(new, old))
+    if orders or cancelled or spent or last_order_at is not None:
+        # al borrar no se crea la fila: si el cliente se está borrando en cascada ya no existe
+        apply_order_stats(client_id, orders, cancelled, spent, last_order_at, create=after is not None)
+
+
+def rebuild_order_stats(batch_size=1000):
+    """Reconstruye la tabla completa desde las órdenes con un solo GROUP BY. Devuelve la cantidad de clientes."""
+    rows = Order.objects.values('client_id').annotate(
+        orders=Count('id', filter=~Q(status=CANCELLED)),
+        cancelled=Count('id', filter=Q(status=CANCELLED)),
+        spent=Sum('total_price', filter=~Q(status=CANCELLED)),
+        last_order_at=Max('created_at'),
+    ).order_by()
+
+    with transaction.atomic():
+        ClientOrderStats.objects.all().delete()
+        written = 0
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(ClientOrderStats(
+                client_id=row['client_id'], order_count=row['orders'], cancelled_count=row['cancelled'],
+                total_spent=row['spent'] or 0, last_order_at=row['last_order_at'],
+            ))
+            if len(batch) >= batch_size:
+                ClientOrderStats.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        ClientOrderStats.objects.bulk_create(batch)
+        written += len(batch)
+    return written
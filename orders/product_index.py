@@ -0,0 +1,46 @@
+import threading
+import time
+
+from django.conf import settings
+
+from products.models import Product
+from .speech_processing import ProductNameIndex
+
+# Un índice por proceso (worker de gunicorn). Se construye en la primera petición de voz,
+# se parchea con las señales de Product y se reconstruye entero cada VOICE_INDEX_TTL segundos,
+# que es lo que tarda en enterarse de los cambios hechos en otros procesos. No depende de la
+# versión del catálogo: esa sube con cada orden y cada guardado, aunque ningún nombre cambie.
+_index = None
+_built_at = 0.0
+_lock = threading.Lock()
+
+
+def _build_index():
+    productos = Product.objects.filter(is_active=True, is_available=True).values('id', 'name')
+    return ProductNameIndex(productos)
+
+
+def get_product_index():
+    global _index, _built_at
+
+    ttl = getattr(settings, 'VOICE_INDEX_TTL', 300)
+    with _lock:
+        if _index is None or (ttl and time.monotonic() - _built_at > ttl):
+            _index = _build_index()
+            _built_at = time.monotonic()
+        return _index
+
+
+def sync_product(product):
+    if _index is None:
+        return
+    if product.is_active and product.is_available:
+        _index.actualizar(product.id, product.name)
+    else:
+        _index.eliminar(product.id)
+
+
+def remove_product(product_id):
+    if _index is not None:
+        _index.eliminar(product_id)
+
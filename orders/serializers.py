@@ -1,6 +1,8 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import Order, OrderItem, Cart, CartItem
-from .models import OrderStatusHistory
+from .models import OrderStatusHistory, ClientMetrics, ClientOrderStats
+from .services import record_daily_sales
 
 
 class OrderStatusHistorySerializer(serializers.ModelSerializer):
@@ -14,7 +16,8 @@ class OrderItemSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = OrderItem
-        fields = ('id', 'product', 'product_name', 'quantity')
+        fields = ('id', 'product', 'product_name', 'quantity', 'unit_price')
+        read_only_fields = ('unit_price',)
 
 class CartItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -23,6 +26,15 @@ class CartItemSerializer(serializers.ModelSerializer):
         model = CartItem
         fields = ('id', 'product', 'product_name', 'quantity')
 
+class CartItemBulkEntrySerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, default=1)
+
+
+class CartItemBulkSerializer(serializers.Serializer):
+    items = CartItemBulkEntrySerializer(many=True, allow_empty=False)
+
+
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, required=False)
 
@@ -31,6 +43,7 @@ class CartSerializer(serializers.ModelSerializer):
         fields = ('id', 'user', 'items','total_price')
         read_only_fields = ('user',)
 
+    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop('items', [])
         request = self.context.get('request')
@@ -58,6 +71,7 @@ class OrderSerializer(serializers.ModelSerializer):
             'created_at': {'read_only': True},
         }
 
+    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop('items', [])
         request = self.context.get('request')
@@ -68,24 +82,24 @@ class OrderSerializer(serializers.ModelSerializer):
         order = Order.objects.create(client=user, **validated_data)
 
         total_price = 0
+        sales = []
         for item_data in items_data:
             product = item_data['product']
             quantity = item_data['quantity']
+            unit_price = product.final_price
 
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, unit_price=unit_price)
+            sales.append((product.id, quantity, unit_price))
 
-            OrderItem.objects.create(order=order, product=product, quantity=quantity)
-
-
-            total_price += product.final_price * quantity
+            total_price += unit_price * quantity
 
 
             product.stock -= quantity
-            if product.stock <= 0:
-                product.is_active = False
             product.save()
 
         order.total_price = total_price
         order.save()
+        record_daily_sales(order, sales)
 
         return order
 
@@ -111,4 +125,21 @@ class OrderSerializer(serializers.ModelSerializer):
             instance.status = new_status
 
         instance.save()
-        return instance
\ No newline at end of file
+        return instance
+
+class ClientOrderStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ClientOrderStats
+        fields = ('order_count', 'cancelled_count', 'total_spent', 'last_order_at')
+
+
+class ClientMetricsSerializer(serializers.ModelSerializer):
+    client_email = serializers.EmailField(source='client.correo', read_only=True)
+    client_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ClientMetrics
+        exclude = ('id',)
+
+    def get_client_name(self, obj):
+        return f"{obj.client.nombre} {obj.client.apellido}"
@@ -0,0 +1,163 @@
+from decimal import Decimal
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from products.catalog import bump_catalog_version
+from products.models import Product
+from .models import Cart, CartItem, Order, OrderItem, ProductDailySales
+from .product_index import remove_product
+from .utils import bulk_upsert_increment
+
+
+class OrderPlacementError(Exception):
+    pass
+
+
+def upsert_cart_items(cart, quantities):
+    """Suma `quantities` ({product_id: cantidad}) a las líneas del carrito en una sola sentencia."""
+    bulk_upsert_increment(
+        CartItem,
+        [{'cart': cart.id, 'product': product_id, 'quantity': quantity}
+         for product_id, quantity in quantities.items()],
+        unique_fields=['cart', 'product'],
+        increment_fields=['quantity'],
+    )
+
+
+def add_items_to_cart(cart, quantities):
+    """
+    Agrega varios productos al carrito con un número constante de consultas: una para resolver
+    los productos y otra para el upsert. Solo se agregan los productos activos y disponibles;
+    devuelve {product_id: Product} con los que se agregaron.
+    """
+    products = Product.objects.filter(
+        id__in=quantities, is_active=True, is_available=True
+    ).only('id', 'name').in_bulk()
+
+    upsert_cart_items(cart, {
+        product_id: quantity for product_id, quantity in quantities.items() if product_id in products
+    })
+    return products
+
+
+
+def record_daily_sales(order, lines):
+    """
+    Suma las líneas de la orden (product_id, cantidad, precio unitario) al rollup del día de la
+    orden con un solo upsert. Debe llamarse dentro de la transacción que crea la orden.
+    """
+    day = timezone.localdate(order.created_at)
+    totals = {}
+    for product_id, quantity, unit_price in lines:
+        units, revenue = totals.get(product_id, (0, Decimal('0')))
+        totals[product_id] = (units + quantity, revenue + unit_price * quantity)
+
+    bulk_upsert_increment(
+        ProductDailySales,
+        [{'product': product_id, 'day': day, 'units': units, 'revenue': revenue}
+         for product_id, (units, revenue) in totals.items()],
+        unique_fields=['product', 'day'],
+        increment_fields=['units', 'revenue'],
+    )
+
+
+def rebuild_daily_sales(start_day=None, end_day=None, batch_size=1000):
+    """
+    Reconstruye el rollup desde el historial de órdenes (todo, o solo los días del rango) con
+    un GROUP BY por producto y día. Devuelve la cantidad de filas escritas.
+    """
+    rollup = ProductDailySales.objects.all()
+    items = OrderItem.objects.annotate(day=TruncDate('order__created_at'))
+    if start_day:
+        rollup = rollup.filter(day__gte=start_day)
+        items = items.filter(day__gte=start_day)
+    if end_day:
+        rollup = rollup.filter(day__lte=end_day)
+        items = items.filter(day__lte=end_day)
+
+    rows = items.values('product_id', 'day').annotate(
+        total_units=Sum('quantity'),
+        total_revenue=Sum(F('quantity') * F('unit_price'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+    ).order_by()
+
+    with transaction.atomic():
+        rollup.delete()
+        written = 0
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(ProductDailySales(
+                product_id=row['product_id'], day=row['day'],
+                units=row['total_units'], revenue=row['total_revenue'] or 0,
+            ))
+            if len(batch) >= batch_size:
+                ProductDailySales.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        ProductDailySales.objects.bulk_create(batch)
+        written += len(batch)
+    return written
+
+
+def place_order_from_cart(user_id):
+    """
+    Convierte el carrito del usuario en una orden dentro de una sola transacción.
+
+    Se bloquean el carrito y las filas de sus productos (en orden de id, para que dos webhooks
+    concurrentes no se bloqueen entre sí), el stock se descuenta con un único UPDATE con F() y
+    las líneas se insertan con bulk_create junto con el rollup de ventas del día. Lanza Cart.DoesNotExist si el usuario no tiene
+    carrito y OrderPlacementError si está vacío o falta stock.
+    """
+    with transaction.atomic():
+        cart = Cart.objects.select_for_update().get(user_id=user_id)
+        quantities = dict(
+            CartItem.objects.filter(cart=cart).order_by('product_id').values_list('product_id', 'quantity')
+        )
+        if not quantities:
+            raise OrderPlacementError('Carrito vacío.')
+
+        products = list(
+            Product.objects.select_for_update()
+            .filter(id__in=quantities)
+            .order_by('id')
+            .annotate(unit_price=F('final_price'))
+            .values('id', 'name', 'stock', 'unit_price')
+        )
+        sin_stock = [p['name'] for p in products if p['stock'] < quantities[p['id']]]
+        if sin_stock:
+            raise OrderPlacementError(f"Stock insuficiente para: {', '.join(sin_stock)}")
+
+        threshold, now = settings.LOW_STOCK_THRESHOLD, timezone.now()
+        Product.objects.filter(id__in=quantities).update(
+            stock=Case(
+                *[When(id=product_id, then=F('stock') - quantity) for product_id, quantity in quantities.items()]
+            ),
+            # solo se marca el cruce del umbral; el aviso lo manda el resumen periódico
+            low_stock_since=Case(
+                *[When(id=product_id, stock__lt=threshold + quantity, low_stock_since__isnull=True,
+                       then=Value(now))
+                  for product_id, quantity in quantities.items()],
+                default=F('low_stock_since'),
+            ),
+            updated_at=now,
+        )
+
+        total_price = sum((p['unit_price'] * quantities[p['id']] for p in products), Decimal('0'))
+        order = Order.objects.create(client_id=user_id, status='paid', total_price=total_price)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=p['id'], quantity=quantities[p['id']], unit_price=p['unit_price'])
+            for p in products
+        ])
+        record_daily_sales(order, [(p['id'], quantities[p['id']], p['unit_price']) for p in products])
+        cart.delete()
+        bump_catalog_version()
+
+        for p in products:
+            if p['stock'] <= quantities[p['id']]:
+                transaction.on_commit(partial(remove_product, p['id']))
+
+    return order
@@ -1,12 +1,18 @@
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
+from django.utils import timezone
+from products.models import Product
+from products.analytics import bump_sales_analytics_version
 from .models import Order, OrderStatusHistory
+from .product_index import sync_product, remove_product
+from . import order_stats
 
 
 @receiver(pre_save, sender=Order)
 def track_order_status_change(sender, instance, **kwargs):
     if instance.pk:
         previous = Order.objects.get(pk=instance.pk)
+        instance._previous_stats = (previous.status, previous.total_price)
         if previous.status != instance.status:
             OrderStatusHistory.objects.create(
                 order=instance,
@@ -19,4 +25,45 @@ def track_order_status_change(sender, instance, **kwargs):
 def update_order_status_from_history(sender, instance, created, **kwargs):
         order = instance.order
         if order.status != instance.new_status:
-            Order.objects.filter(pk=order.pk).update(status=instance.new_status)
+            Order.objects.filter(pk=order.pk).update(status=instance.new_status, updated_at=timezone.now())
+            order_stats.record_order_change(
+                order.client_id, (order.status, order.total_price), (instance.new_status, order.total_price)
+            )
+
+
+@receiver(post_save, sender=Product)
+def sync_voice_index_on_save(sender, instance, **kwargs):
+    sync_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def sync_voice_index_on_delete(sender, instance, **kwargs):
+    remove_product(instance.pk)
+
+
+@receiver(post_save, sender=Order)
+def invalidate_sales_analytics_on_save(sender, instance, created, **kwargs):
+    if created:
+        bump_sales_analytics_version()
+
+
+@receiver(post_delete, sender=Order)
+def invalidate_sales_analytics_on_delete(sender, instance, **kwargs):
+    bump_sales_analytics_version()
+
+
+@receiver(post_save, sender=Order)
+def update_client_order_stats_on_save(sender, instance, created, **kwargs):
+    if created:
+        order_stats.record_order_change(
+            instance.client_id, after=(instance.status, instance.total_price), last_order_at=instance.created_at
+        )
+    elif hasattr(instance, '_previous_stats'):
+        before = instance._previous_stats
+        del instance._previous_stats
+        order_stats.record_order_change(instance.client_id, before, (instance.status, instance.total_price))
+
+
+@receiver(post_delete, sender=Order)
+def update_client_order_stats_on_delete(sender, instance, **kwargs):
+    order_stats.record_order_change(instance.client_id, before=(instance.status, instance.total_price))
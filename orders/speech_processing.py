@@ -1,4 +1,23 @@
 import re
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+STOPWORDS = {'el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'y', 'o',
+             'a', 'ante', 'con', 'de', 'desde', 'en', 'para', 'por', 'sin',
+             'sobre', 'quiero', 'necesito', 'agregar', 'añadir', 'anadir', 'comprar', 'mi', 'pedir'}
+
+NUMEROS = {
+    "un": 1, "uno": 1, "una": 1, "dos": 2, "tres": 3, "cuatro": 4,
+    "cinco": 5, "seis": 6, "siete": 7, "ocho": 8, "nueve": 9, "diez": 10
+}
+
+# si una alternativa queda a menos de este margen del mejor puntaje, la coincidencia es ambigua
+MARGEN_AMBIGUEDAD = 0.1
+
+_NO_PALABRA_RE = re.compile(r'[^\w\s]+')
+_PALABRA_RE = re.compile(r'\w+')
 
 
 def singularizar_palabra(palabra):
@@ -9,41 +28,19 @@ def singularizar_palabra(palabra):
     return palabra
 
 
-def extraer_cantidad(texto):
-    texto = texto.lower()
-
-    patrones_cantidad = [
-
-        r'(\d+)\s+(unidades|productos|camaras|cámaras|webcams|unidad|cpus|cpu)',
-
-        r'(quiero|necesito|agregar|añadir|comprar|pedir)\s+(\d+)(?!\s*[a-z0-9])',
-    ]
-
-    for patron in patrones_cantidad:
-        match = re.search(patron, texto)
-        if match:
-            grupos = match.groups()
-            if patron.startswith(r'(\d+)'):
-                return int(grupos[0])
-            else:
-                return int(grupos[1])
-
-    palabras_a_numeros = {
-        "uno": 1, "una": 1, "dos": 2, "tres": 3, "cuatro": 4,
-        "cinco": 5, "seis": 6, "siete": 7, "ocho": 8, "nueve": 9, "diez": 10
-    }
-
-    for palabra, valor in palabras_a_numeros.items():
-        patron = rf'(quiero|necesito|agregar|añadir|comprar|pedir)\s+{palabra}'
-        if re.search(patron, texto):
-            return valor
+def normalizar_texto(texto):
+    # minúsculas, sin tildes ni signos de puntuación y con espacios simples
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(_NO_PALABRA_RE.sub(' ', texto).split())
 
-    primeras_palabras = texto.split()[:2]
-    for palabra in primeras_palabras:
-        if palabra in palabras_a_numeros:
-            return palabras_a_numeros[palabra]
 
-    return 1
+def formas_de_palabra(palabra):
+    # "mouses" -> {"mouses", "mouse", "mous"}: así el singular y el plural comparten alguna forma
+    formas = {palabra, singularizar_palabra(palabra)}
+    if palabra.endswith('s'):
+        formas.add(palabra[:-1])
+    return formas
 
 
 def pluralizar_palabra(palabra):
@@ -58,38 +55,407 @@ def pluralizar_palabra(palabra):
         return palabra + 'es'
 
 
-def detectar_productos_en_texto(texto, productos_backend):
-    texto = texto.lower()
+class NameAutomaton:
+    """Autómata de Aho-Corasick: encuentra todas las frases en una sola pasada por el texto."""
+
+    def __init__(self, frases):
+        self._transiciones = [{}]
+        self._fallo = [0]
+        self._salidas = [[]]
+
+        for frase, valor in frases:
+            estado = 0
+            for caracter in frase:
+                siguiente = self._transiciones[estado].get(caracter)
+                if siguiente is None:
+                    siguiente = len(self._transiciones)
+                    self._transiciones[estado][caracter] = siguiente
+                    self._transiciones.append({})
+                    self._fallo.append(0)
+                    self._salidas.append([])
+                estado = siguiente
+            self._salidas[estado].append((len(frase), valor))
+
+        cola = deque(self._transiciones[0].values())
+        while cola:
+            estado = cola.popleft()
+            for caracter, siguiente in self._transiciones[estado].items():
+                cola.append(siguiente)
+                fallo = self._fallo[estado]
+                while fallo and caracter not in self._transiciones[fallo]:
+                    fallo = self._fallo[fallo]
+                destino = self._transiciones[fallo].get(caracter, 0)
+                self._fallo[siguiente] = destino
+                self._salidas[siguiente] = self._salidas[siguiente] + self._salidas[self._fallo[siguiente]]
+
+    def buscar(self, texto):
+        """Devuelve (inicio, fin, valor) por cada aparición de una frase en el texto."""
+        encontrados = []
+        estado = 0
+        for posicion, caracter in enumerate(texto):
+            while estado and caracter not in self._transiciones[estado]:
+                estado = self._fallo[estado]
+            estado = self._transiciones[estado].get(caracter, 0)
+            for longitud, valor in self._salidas[estado]:
+                encontrados.append((posicion - longitud + 1, posicion + 1, valor))
+        return encontrados
+
+
+def distancia_edicion(a, b, maximo=None):
+    """Distancia de Levenshtein; si se pasa `maximo` corta en cuanto se supera y devuelve maximo + 1."""
+    if len(a) < len(b):
+        a, b = b, a
+    if maximo is not None and len(a) - len(b) > maximo:
+        return maximo + 1
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        actual = [i]
+        for j, cb in enumerate(b, 1):
+            actual.append(min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (ca != cb)))
+        if maximo is not None and min(actual) > maximo:
+            return maximo + 1
+        anterior = actual
+    return anterior[-1]
+
+
+class BKTree:
+    """Árbol BK sobre las palabras de los nombres: búsqueda por distancia de edición sin recorrer todo el vocabulario."""
+
+    def __init__(self, palabras=()):
+        self._raiz = None
+        for palabra in palabras:
+            self.agregar(palabra)
+
+    def agregar(self, palabra):
+        if self._raiz is None:
+            self._raiz = (palabra, {})
+            return
+        nodo = self._raiz
+        while True:
+            distancia = distancia_edicion(palabra, nodo[0])
+            if distancia == 0:
+                return
+            hijo = nodo[1].get(distancia)
+            if hijo is None:
+                nodo[1][distancia] = (palabra, {})
+                return
+            nodo = hijo
+
+    def buscar(self, palabra, radio):
+        """Devuelve [(palabra, distancia)] con distancia <= radio."""
+        if self._raiz is None:
+            return []
+        encontradas = []
+        pendientes = [self._raiz]
+        while pendientes:
+            candidata, hijos = pendientes.pop()
+            distancia = distancia_edicion(palabra, candidata)
+            if distancia <= radio:
+                encontradas.append((candidata, distancia))
+            for distancia_hijo, hijo in hijos.items():
+                if distancia - radio <= distancia_hijo <= distancia + radio:
+                    pendientes.append(hijo)
+        return encontradas
+
+
+class ProductNameIndex:
+    """
+    Índice de nombres de producto para el reconocimiento de voz.
+
+    Guarda un índice invertido (forma de palabra -> ids de producto) y un autómata con los
+    nombres completos y sus plurales. Se puede parchear producto a producto; el autómata se
+    reconstruye de forma perezosa en la siguiente búsqueda tras un cambio.
+    """
+
+    def __init__(self, productos=()):
+        self._lock = threading.RLock()
+        self._nombres = {}
+        self._etiquetas = {}
+        self._tokens = {}
+        self._palabras = {}
+        self._automata = None
+        self._arbol = None
+        for producto in productos:
+            self._agregar(producto['id'], producto['name'])
+
+    def __len__(self):
+        return len(self._nombres)
+
+    def nombre(self, product_id):
+        return self._etiquetas.get(product_id)
+
+    def palabras_del_nombre(self, product_id):
+        nombre = self._nombres.get(product_id)
+        return set(nombre.split()) if nombre else set()
+
+    def actualizar(self, product_id, nombre):
+        with self._lock:
+            # los guardados que no tocan el nombre (stock, precio, descuento) no invalidan nada
+            if product_id in self._nombres and self._nombres[product_id] == normalizar_texto(nombre):
+                self._etiquetas[product_id] = nombre
+                return
+            self._quitar(product_id)
+            self._agregar(product_id, nombre)
 
-    stopwords = ['el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'y', 'o',
-                 'a', 'ante', 'con', 'de', 'desde', 'en', 'para', 'por', 'sin',
-                 'sobre', 'quiero', 'necesito', 'agregar', 'añadir', 'comprar', 'mi', 'pedir']
+    def eliminar(self, product_id):
+        with self._lock:
+            self._quitar(product_id)
 
-    palabras = texto.split()
-    palabras_significativas = [p for p in palabras if len(p) > 2 and p not in stopwords]
+    def productos_con_palabra(self, palabra):
+        ids = set()
+        for forma in formas_de_palabra(palabra):
+            ids.update(self._tokens.get(forma, ()))
+        return ids
 
-    productos_detectados = []
+    def productos_con_palabra_exacta(self, palabra):
+        return set(self._palabras.get(palabra, ()))
 
-    for producto in productos_backend:
-        nombre_producto = producto['name'].lower()
-        nombre_producto_plural = pluralizar_palabra(nombre_producto)
+    def buscar_frases(self, texto_normalizado):
+        return self._get_automata().buscar(texto_normalizado)
 
-        if nombre_producto in texto or nombre_producto_plural in texto:
-            cantidad = extraer_cantidad(texto)
-            productos_detectados.append({
-                "product": producto['id'],
-                "quantity": cantidad,
-            })
-        else:
+    def palabras_parecidas(self, palabra, radio):
+        return self._get_arbol().buscar(palabra, radio)
+
+    def _agregar(self, product_id, nombre):
+        etiqueta = nombre
+        nombre = normalizar_texto(nombre)
+        if not nombre:
+            return
+        self._nombres[product_id] = nombre
+        self._etiquetas[product_id] = etiqueta
+        for palabra in set(nombre.split()):
+            self._palabras.setdefault(palabra, set()).add(product_id)
+            for forma in formas_de_palabra(palabra):
+                self._tokens.setdefault(forma, set()).add(product_id)
+        self._automata = None
+        self._arbol = None
+
+    def _quitar(self, product_id):
+        nombre = self._nombres.pop(product_id, None)
+        if nombre is None:
+            return
+        self._etiquetas.pop(product_id, None)
+        for palabra in set(nombre.split()):
+            ids = self._palabras.get(palabra)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self._palabras[palabra]
+            for forma in formas_de_palabra(palabra):
+                ids = self._tokens.get(forma)
+                if ids is not None:
+                    ids.discard(product_id)
+                    if not ids:
+                        del self._tokens[forma]
+        self._automata = None
+        self._arbol = None
+
+    def _get_automata(self):
+        with self._lock:
+            if self._automata is None:
+                frases = []
+                for product_id, nombre in self._nombres.items():
+                    frases.append((nombre, product_id))
+                    plural = pluralizar_palabra(nombre)
+                    if plural != nombre:
+                        frases.append((plural, product_id))
+                self._automata = NameAutomaton(frases)
+            return self._automata
+
+    def _get_arbol(self):
+        with self._lock:
+            if self._arbol is None:
+                self._arbol = BKTree(self._palabras)
+            return self._arbol
+
+
+def _menciones_de_frases(indice, texto, inicios):
+    # rangos de tokens (primero, último) de cada nombre completo encontrado, uniendo los solapados
+    rangos = {}
+    for inicio, fin, product_id in indice.buscar_frases(texto):
+        primero = bisect_right(inicios, inicio) - 1
+        ultimo = bisect_left(inicios, fin) - 1
+        rangos.setdefault(product_id, []).append((primero, ultimo))
+
+    menciones = []
+    for product_id, spans in rangos.items():
+        spans.sort()
+        primero, ultimo = spans[0]
+        for siguiente_primero, siguiente_ultimo in spans[1:]:
+            if siguiente_primero <= ultimo:
+                ultimo = max(ultimo, siguiente_ultimo)
+            else:
+                menciones.append((primero, ultimo, product_id))
+                primero, ultimo = siguiente_primero, siguiente_ultimo
+        menciones.append((primero, ultimo, product_id))
+
+    # "laptop lenovo" dentro de "laptop lenovo yoga" no es una mención aparte
+    return [
+        mencion for mencion in menciones
+        if not any(
+            otra[2] != mencion[2] and otra[0] <= mencion[0] and mencion[1] <= otra[1]
+            and otra[1] - otra[0] > mencion[1] - mencion[0]
+            for otra in menciones
+        )
+    ]
+
+
+def _asignar_cantidades(cantidades, menciones):
+    """
+    Empareja cada cantidad con la mención más cercana que aún no tenga cantidad.
+    A igual distancia gana la mención que viene después ("dos cámaras y tres teclados").
+    """
+    asignadas = {}
+    for posicion, valor in cantidades:
+        mejor = None
+        for indice_mencion, mencion in enumerate(menciones):
+            if indice_mencion in asignadas:
+                continue
+            primero, ultimo = mencion[0], mencion[1]
+            if posicion < primero:
+                clave = (primero - posicion, 0)
+            else:
+                clave = (posicion - ultimo, 1)
+            if mejor is None or clave < mejor[0]:
+                mejor = (clave, indice_mencion)
+        if mejor is not None:
+            asignadas[mejor[1]] = valor
+    return asignadas
+
+
+def _radio_permitido(palabra, max_distancia):
+    # las palabras cortas casi no admiten errores: "mouse" con 2 cambios ya es otra palabra
+    return min(max_distancia, max(0, (len(palabra) - 2) // 2))
+
+
+def _menciones_aproximadas(indice, menciones_exactas, aproximadas, puntaje_minimo):
+    """
+    Puntúa cada producto con la similitud media de las palabras que se le parecen y se queda,
+    por cada tramo de la frase, con el que cubre más palabras y, a igual cobertura, con el que
+    se nombró completo ("laptop lenovo" antes que "Laptop Lenovo Yoga"); los que compiten por
+    las mismas palabras quedan como alternativas.
+    """
+    candidatos = [
+        (1.0, set(range(primero, ultimo + 1)), product_id, True)
+        for primero, ultimo, product_id in menciones_exactas
+    ]
+    for product_id, por_posicion in aproximadas.items():
+        palabras_nombre = len(indice.palabras_del_nombre(product_id))
+        if len(por_posicion) < min(2, palabras_nombre):
+            continue
+        puntaje = sum(por_posicion.values()) / len(por_posicion)
+        candidatos.append((round(puntaje, 3), set(por_posicion), product_id, len(por_posicion) >= palabras_nombre))
+
+    candidatos.sort(key=lambda c: (-len(c[1]), not c[3], -c[0], min(c[1])))
+
+    aceptadas = []
+    for puntaje, posiciones, product_id, completo in candidatos:
+        if puntaje < puntaje_minimo:
+            continue
+        solapada = next((m for m in aceptadas if m['posiciones'] & posiciones), None)
+        if solapada is None:
+            aceptadas.append({'posiciones': posiciones, 'product': product_id, 'score': puntaje,
+                              'completo': completo, 'alternativas': []})
+        elif product_id != solapada['product'] and all(
+                product_id != alternativa[1] for alternativa in solapada['alternativas']):
+            # un nombre del que solo se dijo una parte no compite con uno dicho completo
+            empata = completo or not solapada['completo']
+            solapada['alternativas'].append((puntaje, product_id, len(posiciones) if empata else 0))
+
+    return [
+        (min(m['posiciones']), max(m['posiciones']), m['product'], m['score'], m['alternativas'],
+         len(m['posiciones']))
+        for m in aceptadas
+    ]
+
+
+def detectar_productos_en_texto(texto, productos_backend, max_distancia=None, puntaje_minimo=0.6):
+    """
+    Recorre la frase una sola vez y devuelve los pares producto/cantidad mencionados,
+    en el orden en que se dijeron. Las cantidades sin producto se descartan y los productos
+    sin cantidad cuentan como una unidad.
+
+    Con `max_distancia` se activa el modo aproximado: cada palabra se busca en el árbol BK
+    del índice admitiendo hasta esa distancia de edición, y cada resultado trae `score`,
+    `candidates` (ordenados por puntaje) y `ambiguous` para que el cliente pueda confirmar.
+    """
+    if not isinstance(productos_backend, ProductNameIndex):
+        productos_backend = ProductNameIndex(productos_backend)
+    indice = productos_backend
+    aproximado = max_distancia is not None
+
+    texto = normalizar_texto(texto)
+
+    inicios = []
+    cantidades = []
+    coincidencias = {}
+    aproximadas = {}
+    for posicion, match in enumerate(_PALABRA_RE.finditer(texto)):
+        palabra = match.group()
+        inicios.append(match.start())
+        if palabra.isdigit():
+            cantidades.append((posicion, int(palabra)))
+        elif palabra in NUMEROS:
+            cantidades.append((posicion, NUMEROS[palabra]))
+        elif len(palabra) > 2 and palabra not in STOPWORDS:
+            exactos = indice.productos_con_palabra(palabra)
+            for product_id in exactos:
+                coincidencias.setdefault(product_id, []).append(posicion)
+            if not aproximado:
+                continue
+            for product_id in exactos:
+                aproximadas.setdefault(product_id, {})[posicion] = 1.0
+            radio = _radio_permitido(palabra, max_distancia)
+            if exactos or not radio:
+                continue
+            for parecida, distancia in indice.palabras_parecidas(palabra, radio):
+                similitud = 1 - distancia / max(len(palabra), len(parecida))
+                for product_id in indice.productos_con_palabra_exacta(parecida):
+                    por_posicion = aproximadas.setdefault(product_id, {})
+                    por_posicion[posicion] = max(similitud, por_posicion.get(posicion, 0))
+
+    menciones = _menciones_de_frases(indice, texto, inicios)
+    if aproximado:
+        menciones = _menciones_aproximadas(indice, menciones, aproximadas, puntaje_minimo)
+    else:
+        frases = list(menciones)
+        con_frase = {product_id for _, _, product_id in frases}
+        for product_id, posiciones in coincidencias.items():
+            if len(posiciones) < 2 or product_id in con_frase:
+                continue
+            # palabras que ya son parte de un nombre completo ("laptop lenovo" en "laptop lenovo yoga")
+            if all(any(primero <= posicion <= ultimo for primero, ultimo, _ in frases) for posicion in posiciones):
+                continue
+            menciones.append((posiciones[0], posiciones[-1], product_id))
+    menciones.sort()
+
+    # un número dentro de un nombre ("Monitor 24") no es una cantidad
+    cantidades = [
+        (posicion, valor) for posicion, valor in cantidades
+        if not any(mencion[0] <= posicion <= mencion[1] for mencion in menciones)
+    ]
+    asignadas = _asignar_cantidades(cantidades, menciones)
 
-            palabras_nombre = nombre_producto.split()
-            coincidencias = sum(1 for p in palabras_significativas if p in palabras_nombre)
+    detectados = {}
+    for indice_mencion, mencion in enumerate(menciones):
+        product_id = mencion[2]
+        item = detectados.setdefault(product_id, {"product": product_id, "quantity": 0})
+        item["quantity"] += asignadas.get(indice_mencion, 1)
+        if not aproximado:
+            continue
 
-            if coincidencias >= 2:
-                cantidad = extraer_cantidad(texto)
-                productos_detectados.append({
-                    "product": producto['id'],
-                    "quantity": cantidad,
-                })
+        puntaje, alternativas, palabras = mencion[3], mencion[4], mencion[5]
+        ranking = [(puntaje, product_id)] + [
+            (valor, candidato) for valor, candidato, _ in sorted(alternativas, key=lambda c: (-c[2], -c[0]))
+        ]
+        item["score"] = max(puntaje, item.get("score", 0))
+        item["candidates"] = [
+            {"product": candidato, "name": indice.nombre(candidato), "score": valor}
+            for valor, candidato in ranking[:5]
+        ]
+        item["ambiguous"] = item.get("ambiguous", False) or any(
+            cubiertas == palabras and puntaje - valor <= MARGEN_AMBIGUEDAD
+            for valor, _, cubiertas in alternativas
+        )
 
-    return productos_detectados
+    return list(detectados.values())
@@ -0,0 +1,152 @@
+import logging
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from users.models import Usuario
+from users.utils import queue_email
+from .models import Cart, StripeEvent
+from .services import place_order_from_cart, OrderPlacementError
+from .invoices import get_or_render_invoice
+
+logger = logging.getLogger(__name__)
+
+
+class PermanentEventError(Exception):
+    """El evento no se va a poder procesar por más que se reintente; pasa directo a 'fallido'."""
+
+
+def store_event(event_id, event_type, payload):
+    """Guarda el evento ya verificado. Devuelve False si Stripe lo está reenviando."""
+    _, created = StripeEvent.objects.get_or_create(
+        event_id=event_id,
+        defaults={'event_type': event_type, 'payload': payload},
+    )
+    return created
+
+
+def claim_events(batch_size, stale_after=timedelta(minutes=10)):
+    """
+    Marca como 'procesando' hasta `batch_size` eventos listos y devuelve sus ids. Con
+    SKIP LOCKED varios workers pueden reclamar a la vez sin pisarse; los que quedaron en
+    'procesando' más de `stale_after` (worker caído) se vuelven a reclamar.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            StripeEvent.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status='pendiente', next_attempt_at__lte=now) |
+                Q(status='procesando', locked_at__lt=now - stale_after)
+            )
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        StripeEvent.objects.filter(id__in=ids).update(
+            status='procesando', locked_at=now, attempts=F('attempts') + 1
+        )
+    return ids
+
+
+def process_event(event_id, max_attempts=5, backoff_seconds=30):
+    event = StripeEvent.objects.get(pk=event_id)
+    handler = EVENT_HANDLERS.get(event.event_type)
+
+    try:
+        if handler is not None:
+            handler(event)
+    except PermanentEventError as e:
+        logger.error(f"Evento {event.event_id} descartado: {e}")
+        _finish(event, 'fallido', str(e))
+    except Exception as e:
+        if event.attempts >= max_attempts:
+            logger.exception(f"Evento {event.event_id} falló {event.attempts} veces, se descarta")
+            _finish(event, 'fallido', str(e))
+        else:
+            delay = min(backoff_seconds * 2 ** (event.attempts - 1), 3600)
+            logger.warning(f"Evento {event.event_id} falló (intento {event.attempts}), reintento en {delay}s: {e}")
+            StripeEvent.objects.filter(pk=event.pk).update(
+                status='pendiente', locked_at=None, last_error=str(e),
+                next_attempt_at=timezone.now() + timedelta(seconds=delay),
+            )
+    else:
+        _finish(event, 'procesado', '')
+
+
+def _finish(event, status, error):
+    StripeEvent.objects.filter(pk=event.pk).update(
+        status=status, locked_at=None, last_error=error, processed_at=timezone.now()
+    )
+
+
+def handle_checkout_session_completed(event):
+    session = event.payload['data']['object']
+    user_id = (session.get('metadata') or {}).get('user_id')
+
+    if not user_id:
+        raise PermanentEventError('No user_id in metadata')
+
+    # si un intento anterior ya creó la orden, solo falta lo que vino después
+    if event.order_id is None:
+        try:
+            with transaction.atomic():
+                order = place_order_from_cart(user_id)
+                StripeEvent.objects.filter(pk=event.pk).update(order=order)
+        except Cart.DoesNotExist:
+            refund_unfulfilled_payment(event, session, user_id, 'Carrito no encontrado.')
+        except OrderPlacementError as e:
+            refund_unfulfilled_payment(event, session, user_id, str(e))
+        event.order = order
+        logger.info(f"Pago exitoso para usuario {user_id}, orden {order.id} creada y carrito eliminado.")
+
+    order = event.order
+    invoice = get_or_render_invoice(order)
+
+    with invoice.file.open('rb') as pdf:
+        queue_email(
+            [order.client.correo],
+            f"Tu recibo de compra - Orden #{order.id}",
+            "Gracias por tu compra. Adjunto encontrarás tu recibo en PDF.",
+            attachments=[(f"recibo_orden_{order.id}.pdf", pdf.read(), "application/pdf")],
+        )
+
+
+def refund_unfulfilled_payment(event, session, user_id, reason):
+    """
+    El pago entró pero la orden no se pudo crear (por ejemplo, el stock se agotó mientras el
+    cliente pagaba): se reembolsa el pago y se avisa al cliente y a los administradores. La clave
+    de idempotencia hace que un reintento del evento no genere un segundo reembolso; si Stripe
+    falla, la excepción deja el evento para reintentar.
+    """
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    refund = stripe.Refund.create(
+        payment_intent=session['payment_intent'], idempotency_key=f"reembolso-{event.event_id}"
+    )
+    logger.warning(f"Pago del usuario {user_id} reembolsado ({refund.id}) sin crear la orden: {reason}")
+
+    client = Usuario.objects.filter(pk=user_id).values_list('correo', flat=True).first()
+    if client:
+        queue_email(
+            [client],
+            "No pudimos completar tu compra",
+            f"No pudimos completar tu compra: {reason}\n\nTe reembolsamos el pago completo; "
+            f"puede tardar unos días en verse reflejado. Tu carrito sigue disponible.",
+        )
+    admins = list(Usuario.objects.filter(rol=1, is_active=True).exclude(correo='').values_list('correo', flat=True))
+    if admins:
+        queue_email(
+            admins,
+            f"Pago reembolsado sin orden (usuario {user_id})",
+            f"El pago {session['payment_intent']} del usuario {user_id} se reembolsó ({refund.id}) porque "
+            f"no se pudo crear la orden: {reason}\n\nSmartCart System",
+        )
+    raise PermanentEventError(f"{reason} Pago reembolsado ({refund.id}).")
+
+
+EVENT_HANDLERS = {
+    'checkout.session.completed': handle_checkout_session_completed,
+}
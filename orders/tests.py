@@ -1,3 +1,78 @@
-from django.test import TestCase
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import pandas as pd
+from django.test import SimpleTestCase, TestCase
+
+from products.models import Product
+from users.models import EmailOutbox, Rol, Usuario
+from .client_metrics import compute_metrics
+from .models import Cart, CartItem, Order, StripeEvent
+from .stripe_events import process_event
+from .speech_processing import detectar_productos_en_texto
+
+PRODUCTOS = [
+    {'id': 1, 'name': 'Laptop Lenovo'},
+    {'id': 2, 'name': 'Laptop Lenovo Yoga'},
+    {'id': 3, 'name': 'Mouse Logitech'},
+]
+
+
+class DetectarProductosTests(SimpleTestCase):
+    def test_longer_name_covers_its_prefix_in_exact_mode(self):
+        detectados = detectar_productos_en_texto('quiero una laptop lenovo yoga', PRODUCTOS)
+
+        self.assertEqual(detectados, [{'product': 2, 'quantity': 1}])
+
+    def test_full_name_beats_longer_partial_match_in_fuzzy_mode(self):
+        detectados = detectar_productos_en_texto('dos laptop lenovo', PRODUCTOS, max_distancia=2)
+
+        self.assertEqual(len(detectados), 1)
+        self.assertEqual(detectados[0]['product'], 1)
+        self.assertEqual(detectados[0]['quantity'], 2)
+        self.assertFalse(detectados[0]['ambiguous'])
+        self.assertEqual([c['product'] for c in detectados[0]['candidates']], [1, 2])
+
+
+class ComputeMetricsTests(SimpleTestCase):
+    def test_tied_values_share_the_same_score(self):
+        day = datetime(2026, 1, 10, tzinfo=timezone.utc)
+        rows = [(client_id, day, Decimal('10.00')) for client_id in range(1, 9)]
+        rows += [(9, day, Decimal('0.10')), (9, day, Decimal('0.20')), (10, day, Decimal('99.99'))]
+
+        metrics = compute_metrics(rows, pd.Timestamp(datetime(2026, 2, 1, tzinfo=timezone.utc)))
+
+        self.assertEqual(metrics.loc[1:8, 'monetary_score'].nunique(), 1)
+        self.assertEqual(metrics.loc[1:8, 'frequency_score'].nunique(), 1)
+        self.assertEqual(metrics['recency_score'].nunique(), 1)
+        self.assertLess(metrics.loc[1, 'frequency_score'], metrics.loc[9, 'frequency_score'])
+        self.assertGreater(metrics.loc[10, 'monetary_score'], metrics.loc[1, 'monetary_score'])
+        self.assertEqual(metrics.loc[9, 'monetary'], 30)
+
+
+class CheckoutSessionCompletedTests(TestCase):
+    def test_payment_is_refunded_when_stock_ran_out(self):
+        admin_rol = Rol.objects.create(id=1, nombre='admin')
+        Usuario.objects.create_user('admin@test.com', 'Admin', 'Test', 'pw', rol=admin_rol)
+        client = Usuario.objects.create_user('cliente@test.com', 'Cliente', 'Test', 'pw')
+        product = Product.objects.create(name='Leche', price=Decimal('10.00'), stock=1)
+        cart = Cart.objects.create(user=client)
+        CartItem.objects.create(cart=cart, product=product, quantity=2)
+        event = StripeEvent.objects.create(
+            event_id='evt_1', event_type='checkout.session.completed', attempts=1,
+            payload={'data': {'object': {'payment_intent': 'pi_1', 'metadata': {'user_id': str(client.id)}}}},
+        )
+
+        with mock.patch('stripe.Refund.create', return_value=mock.Mock(id='re_1')) as refund:
+            process_event(event.id)
+
+        refund.assert_called_once_with(payment_intent='pi_1', idempotency_key='reembolso-evt_1')
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'fallido')
+        self.assertIn('re_1', event.last_error)
+        self.assertFalse(Order.objects.exists())
+        self.assertTrue(Cart.objects.filter(pk=cart.pk).exists())
+        self.assertEqual(
+            sorted(EmailOutbox.objects.values_list('recipient', flat=True)), ['admin@test.com', 'cliente@test.com']
+        )
@@ -1,18 +1,31 @@
+from django.conf import settings
+from django.core.files.storage import default_storage, storages
+from django.db import connection
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 import io
 
-def generate_invoice_pdf(order):
+
+def get_invoice_storage():
+    """Storage de los recibos: INVOICE_STORAGE ({'BACKEND': ..., 'OPTIONS': ...}) o el storage por defecto."""
+    config = getattr(settings, 'INVOICE_STORAGE', None)
+    if config:
+        return storages.create_storage(config)
+    return default_storage
+
+
+def render_invoice_pdf(data):
+    """Dibuja el recibo a partir de los datos ya cargados (ver orders.invoices); no toca la base de datos."""
     buffer = io.BytesIO()
     p = canvas.Canvas(buffer, pagesize=letter)
     width, height = letter
 
     p.setFont("Helvetica", 16)
-    p.drawString(100, height - 50, f"Recibo de venta - Orden #{order.id}")
+    p.drawString(100, height - 50, f"Recibo de venta - Orden #{data['order_id']}")
     p.setFont("Helvetica", 12)
-    p.drawString(100, height - 80, f"Cliente: {order.client.nombre} {order.client.apellido}")
-    p.drawString(100, height - 100, f"Correo: {order.client.correo}")
-    p.drawString(100, height - 120, f"Fecha: {order.created_at.strftime('%d/%m/%Y')}")
+    p.drawString(100, height - 80, f"Cliente: {data['client_name']}")
+    p.drawString(100, height - 100, f"Correo: {data['client_email']}")
+    p.drawString(100, height - 120, f"Fecha: {data['date']}")
 
     y = height - 160
     total = 0
@@ -20,10 +33,10 @@ def generate_invoice_pdf(order):
     p.drawString(100, y, "Productos Comprados:")
     p.setFont("Helvetica", 12)
 
-    for item in order.items.all():
+    for name, quantity, price in data['items']:
         y -= 20
-        p.drawString(120, y, f"- {item.product.name} (x{item.quantity}) : ${item.product.price * item.quantity}")
-        total += item.product.price * item.quantity
+        p.drawString(120, y, f"- {name} (x{quantity}) : ${price * quantity}")
+        total += price * quantity
 
     y -= 40
     p.setFont("Helvetica-Bold", 14)
@@ -31,5 +44,42 @@ def generate_invoice_pdf(order):
 
     p.showPage()
     p.save()
-    buffer.seek(0)
-    return buffer
+    return buffer.getvalue()
+
+
+def bulk_upsert_increment(model, rows, unique_fields, increment_fields, batch_size=500):
+    """
+    INSERT ... ON CONFLICT DO UPDATE en una sola sentencia por lote: las filas nuevas se insertan
+    y en las existentes se suman los `increment_fields` (PostgreSQL y SQLite >= 3.24).
+    `rows` es una lista de dicts {campo: valor}; para las FK se pasa el id.
+    """
+    if not rows:
+        return
+
+    meta = model._meta
+    quote = connection.ops.quote_name
+    field_names = list(rows[0])
+    fields = [meta.get_field(name) for name in field_names]
+    table = quote(meta.db_table)
+    columns = ', '.join(quote(field.column) for field in fields)
+    conflict = ', '.join(quote(meta.get_field(name).column) for name in unique_fields)
+    updates = ', '.join(
+        f'{quote(meta.get_field(name).column)} = {table}.{quote(meta.get_field(name).column)} + '
+        f'EXCLUDED.{quote(meta.get_field(name).column)}'
+        for name in increment_fields
+    )
+    placeholder = '(' + ', '.join(['%s'] * len(fields)) + ')'
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            params = [
+                field.get_db_prep_save(row[name], connection)
+                for row in batch
+                for name, field in zip(field_names, fields)
+            ]
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) VALUES {", ".join([placeholder] * len(batch))} '
+                f'ON CONFLICT ({conflict}) DO UPDATE SET {updates}',
+                params,
+            )
@@ -1,22 +1,54 @@
-from decimal import Decimal
+import json
+from decimal import Decimal, InvalidOperation
 import stripe
+from django.db import transaction
+from django.db.models import F
+from django.http import FileResponse, HttpResponseNotModified
 from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
+from django.utils.http import http_date
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.response import Response
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.views import APIView
 from SmartCartBackend import settings
+from SmartCartBackend.pagination import IdTiebreakOrderingFilter
 from .permissions import IsOwnerOrAdminOrAssignedDelivery, IsCartOwner
-from .models import Order, OrderItem, OrderStatusHistory, Cart, CartItem
-from .serializers import OrderSerializer, OrderItemSerializer, CartSerializer, CartItemSerializer
+from products.permissions import IsStaffOrSuperUser
+from .models import Order, OrderItem, OrderStatusHistory, Cart, CartItem, ClientMetrics
+from .serializers import OrderSerializer, OrderItemSerializer, CartSerializer, CartItemSerializer, \
+    CartItemBulkSerializer, ClientMetricsSerializer
 from stripe.error import StripeError
-from django.core.mail import EmailMessage
-from .utils import generate_invoice_pdf
 from .speech_processing import detectar_productos_en_texto
-from products.models import Product
+from .product_index import get_product_index
+from .services import add_items_to_cart, upsert_cart_items
+from .stripe_events import store_event
+from .invoices import build_invoice_data, content_hash, get_or_render_invoice
+from products.renderers import CSVRenderer, NDJSONRenderer
+from .exports import EXPORT_FORMATS, streaming_export
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def export_response(request, queryset, columns, filename):
+    """
+    Exporta `columns` ([(encabezado, campo)]) del queryset como CSV (por defecto) o NDJSON
+    (?format=ndjson), con ?gzip=true opcional. Las filas salen de un cursor del lado del
+    servidor (.iterator()).
+    """
+    export_format = request.query_params.get('format', 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        return Response({"error": "format debe ser csv o ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+    compress = request.query_params.get('gzip', '').lower() in ('1', 'true', 'yes')
+
+    headers, fields = zip(*columns)
+    rows = queryset.order_by('id').values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return streaming_export(headers, rows, export_format, filename, compress)
+
 
 class OrderViewSet(viewsets.ModelViewSet):
     serializer_class = OrderSerializer
@@ -53,6 +85,39 @@ class OrderViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(client=self.request.user)
 
+    @action(detail=False, methods=['get'], renderer_classes=[JSONRenderer, CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        return export_response(
+            request, self.filter_queryset(self.get_queryset()),
+            [('id', 'id'), ('client_id', 'client_id'), ('client_email', 'client__correo'),
+             ('delivery_user_id', 'delivery_user_id'), ('status', 'status'), ('total_price', 'total_price'),
+             ('created_at', 'created_at')],
+            'ordenes',
+        )
+
+    @action(detail=True, methods=['get'])
+    def invoice(self, request, pk=None):
+        order = self.get_object()
+        data = build_invoice_data(order)
+        etag = f'"{content_hash(data)}"'
+
+        if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        invoice = get_or_render_invoice(order, data)
+        response = FileResponse(
+            invoice.file.open('rb'),
+            as_attachment=True,
+            filename=f"recibo_orden_{order.id}.pdf",
+            content_type='application/pdf',
+        )
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(invoice.rendered_at.timestamp())
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
 
 class OrderItemViewSet(viewsets.ModelViewSet):
     serializer_class = OrderItemSerializer
@@ -69,6 +134,48 @@ class OrderItemViewSet(viewsets.ModelViewSet):
         else:
             return OrderItem.objects.filter(order__client=user)
 
+    @action(detail=False, methods=['get'], renderer_classes=[JSONRenderer, CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        return export_response(
+            request, self.get_queryset(),
+            [('id', 'id'), ('order_id', 'order_id'), ('order_created_at', 'order__created_at'),
+             ('product_id', 'product_id'), ('product_name', 'product__name'), ('quantity', 'quantity'),
+             ('unit_price', 'unit_price')],
+            'lineas_de_ordenes',
+        )
+
+
+class ClientMetricsViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Segmentación RFM y valor de vida (los calcula `compute_client_metrics`). Filtros:
+    ?segment=, ?rfm_score=, ?min_lifetime_value=, ?max_recency_days=, ?search= por correo;
+    orden con ?ordering= (por ejemplo -lifetime_value).
+    """
+    serializer_class = ClientMetricsSerializer
+    permission_classes = [IsStaffOrSuperUser]
+    filter_backends = [filters.SearchFilter, IdTiebreakOrderingFilter]
+    search_fields = ['client__correo']
+    ordering_fields = ['lifetime_value', 'projected_annual_value', 'monetary', 'frequency', 'recency_days',
+                       'average_order_value', 'last_order_at']
+    ordering = ['-lifetime_value', 'id']
+
+    def get_queryset(self):
+        queryset = ClientMetrics.objects.select_related('client')
+        params = self.request.query_params
+
+        if params.get('segment'):
+            queryset = queryset.filter(segment=params['segment'])
+        if params.get('rfm_score'):
+            queryset = queryset.filter(rfm_score=params['rfm_score'])
+        try:
+            if params.get('min_lifetime_value'):
+                queryset = queryset.filter(lifetime_value__gte=Decimal(params['min_lifetime_value']))
+            if params.get('max_recency_days'):
+                queryset = queryset.filter(recency_days__lte=int(params['max_recency_days']))
+        except (InvalidOperation, ValueError):
+            raise ValidationError({"error": "Filtro numérico inválido."})
+        return queryset
+
 
 class CartViewSet(viewsets.ModelViewSet):
     serializer_class = CartSerializer
@@ -81,14 +188,11 @@ class CartViewSet(viewsets.ModelViewSet):
             return Order.objects.none()
 
         user = self.request.user
+        queryset = Cart.objects.with_total().with_items()
         if user.is_staff or user.is_superuser:
-            return Cart.objects.all()
-
-        queryset = Cart.objects.filter(user=user)
-        if not queryset.exists():
-            return Cart.objects.none()
+            return queryset
 
-        return queryset
+        return queryset.filter(user=user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -101,7 +205,38 @@ class CartItemViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         cart, created = Cart.objects.get_or_create(user=self.request.user)
-        serializer.save(cart=cart)
+        product = serializer.validated_data['product']
+        # si el producto ya está en el carrito se suma la cantidad en lugar de duplicar la línea
+        upsert_cart_items(cart, {product.id: serializer.validated_data.get('quantity', 1)})
+        serializer.instance = CartItem.objects.get(cart=cart, product=product)
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        serializer = CartItemBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        quantities = {}
+        for item in serializer.validated_data['items']:
+            quantities[item['product']] = quantities.get(item['product'], 0) + item['quantity']
+
+        cart, created = Cart.objects.get_or_create(user=request.user)
+        with transaction.atomic():
+            products = add_items_to_cart(cart, quantities)
+            invalid = sorted(set(quantities) - set(products))
+            if invalid:
+                transaction.set_rollback(True)
+                return Response(
+                    {"error": "Productos inexistentes o no disponibles", "invalid_products": invalid},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        return Response({
+            "added_items": [
+                {"product": product_id, "product_name": products[product_id].name, "quantity": quantity}
+                for product_id, quantity in quantities.items()
+            ],
+            "cart_total": cart.total_price
+        }, status=status.HTTP_200_OK)
 
 
 class CheckoutView(APIView):
@@ -113,16 +248,19 @@ class CheckoutView(APIView):
             cart = get_object_or_404(Cart, user=request.user)
             line_items = []
 
-            for item in cart.items.all():
+            items = cart.items.annotate(unit_price=F('product__final_price')).values(
+                'product__name', 'quantity', 'unit_price'
+            )
+            for item in items:
                 line_items.append({
                     'price_data': {
                         'currency': 'usd',
                         'product_data': {
-                            'name': item.product.name,
+                            'name': item['product__name'],
                         },
-                        'unit_amount': int(item.product.price * 100),
+                        'unit_amount': int(item['unit_price'] * 100),
                     },
-                    'quantity': item.quantity,
+                    'quantity': item['quantity'],
                 })
 
             session = stripe.checkout.Session.create(
@@ -155,61 +293,8 @@ class StripeWebhookView(APIView):
         except (ValueError, stripe.error.SignatureVerificationError):
             return Response({'error': 'Invalid payload or signature'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if event['type'] == 'checkout.session.completed':
-            session = event['data']['object']
-            user_id = session.get('metadata', {}).get('user_id')
-
-            if not user_id:
-                return Response({'error': 'No user_id in metadata'}, status=status.HTTP_400_BAD_REQUEST)
-
-            try:
-                cart = Cart.objects.get(user_id=user_id)
-
-                if not cart.items.exists():
-                    return Response({'error': 'Carrito vacío.'}, status=status.HTTP_400_BAD_REQUEST)
-
-                order = Order.objects.create(
-                    client=cart.user,
-                    status='paid'
-                )
-                total_price = Decimal('0')
-                for item in cart.items.all():
-                    OrderItem.objects.create(
-                        order=order,
-                        product=item.product,
-                        quantity=item.quantity
-                    )
-
-                    product = item.product
-                    product.stock -= item.quantity
-                    product.save()
-
-                    price = item.product.final_price
-                    subtotal = price * item.quantity
-                    total_price += subtotal
-
-                order.total_price = total_price
-                order.save()
-
-                cart.delete()
-
-                pdf_buffer = generate_invoice_pdf(order)
-
-                email = EmailMessage(
-                    subject=f"Tu recibo de compra - Orden #{order.id}",
-                    body="Gracias por tu compra. Adjunto encontrarás tu recibo en PDF.",
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    to=[order.client.correo],
-                ) #aqui la cague, quite el {order.id}
-                email.attach(f"recibo_orden_{order.id}.pdf", pdf_buffer.read(), "application/pdf")
-                email.send()
-
-                print(f"Pago exitoso para usuario {user_id}, orden {order.id} creada y carrito eliminado.")
-
-            except Cart.DoesNotExist:
-                return Response({'error': 'Carrito no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
-            except Exception as e:
-                return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        # solo se guarda; el worker `process_stripe_events` crea la orden y envía el recibo
+        store_event(event['id'], event['type'], json.loads(payload))
 
         return Response(status=status.HTTP_200_OK)
 
@@ -228,13 +313,22 @@ class VoiceCartProcessingView(APIView):
             )
 
 
-        productos = Product.objects.filter(is_active=True, is_available=True)
-        productos_formateados = [
-            {"id": p.id, "name": p.name.lower()} for p in productos
-        ]
+        max_distancia = None
+        if str(request.data.get('fuzzy', '')).lower() in ('1', 'true', 'yes'):
+            try:
+                max_distancia = int(request.data.get('max_distance', settings.VOICE_FUZZY_MAX_DISTANCE))
+            except (TypeError, ValueError):
+                return Response(
+                    {"error": "max_distance debe ser un número entero"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            max_distancia = max(0, min(max_distancia, 3))
 
-        #
-        items_detectados = detectar_productos_en_texto(texto, productos_formateados)
+        items_detectados = detectar_productos_en_texto(
+            texto, get_product_index(),
+            max_distancia=max_distancia,
+            puntaje_minimo=settings.VOICE_FUZZY_MIN_SCORE,
+        )
 
         if not items_detectados:
             return Response(
@@ -242,31 +336,41 @@ class VoiceCartProcessingView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        # en modo aproximado, las coincidencias ambiguas se devuelven para que el cliente las confirme
+        ambiguous_items = [item for item in items_detectados if item.get('ambiguous')]
+        items_detectados = [item for item in items_detectados if not item.get('ambiguous')]
+        if not items_detectados:
+            return Response({
+                "message": "Se necesita confirmar los productos detectados",
+                "ambiguous_items": ambiguous_items,
+            }, status=status.HTTP_200_OK)
+
 
         cart, created = Cart.objects.get_or_create(user=request.user)
 
+        quantities = {}
+        for item in items_detectados:
+            quantities[item['product']] = quantities.get(item['product'], 0) + item['quantity']
+        products = add_items_to_cart(cart, quantities)
 
         added_items = []
         for item in items_detectados:
-            product = Product.objects.get(id=item['product'])
-            cart_item, created = CartItem.objects.get_or_create(
-                cart=cart,
-                product=product,
-                defaults={'quantity': item['quantity']}
-            )
-
-
-            if not created:
-                cart_item.quantity += item['quantity']
-                cart_item.save()
+            product = products.get(item['product'])
+            if product is None:
+                continue
 
-            added_items.append({
+            added_item = {
                 'product': product.name,
                 'quantity': item['quantity']
-            })
+            }
+            if 'candidates' in item:
+                added_item['score'] = item['score']
+                added_item['candidates'] = item['candidates']
+            added_items.append(added_item)
 
         return Response({
             "message": "Productos agregados al carrito exitosamente",
             "added_items": added_items,
+            "ambiguous_items": ambiguous_items,
             "cart_total": cart.total_price
         }, status=status.HTTP_200_OK)
\ No newline at end of file
@@ -12,7 +12,7 @@ class LowStockFilter(admin.SimpleListFilter):
 
     def queryset(self, request, queryset):
         if self.value() == 'yes':
-            return queryset.filter(stock__lt=5)
+            return queryset.filter(low_stock_since__isnull=False)
 
 
 @admin.register(Product)
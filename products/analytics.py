@@ -0,0 +1,84 @@
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from orders.models import Order, ProductDailySales
+from .cache_versions import bump_cache_version, cache_version
+
+
+SALES_GRANULARITIES = ('day', 'week', 'month')
+SALES_ANALYTICS_VERSION = 'sales-analytics'
+SALES_ANALYTICS_TIMEOUT = 60 * 60
+
+
+def bump_sales_analytics_version():
+    """Invalida todas las series cacheadas una vez confirmada la transacción que cambió las ventas."""
+    bump_cache_version(SALES_ANALYTICS_VERSION)
+
+
+def sales_timeseries(granularity, start_day, end_day, by_product=False):
+    """
+    Ingresos, unidades y cantidad de órdenes por día/semana/mes entre `start_day` y `end_day`
+    (inclusive). Todo se agrega en la base: unidades e ingresos salen del rollup ProductDailySales
+    y las órdenes de un COUNT agrupado sobre Order. Con `by_product` cada período trae además el
+    detalle por producto.
+    """
+    sales = ProductDailySales.objects.filter(day__gte=start_day, day__lte=end_day).annotate(
+        period=Trunc('day', granularity, output_field=DateField())
+    )
+    # rango sobre la columna (no sobre su fecha) para que use el índice de created_at
+    orders = Order.objects.filter(
+        created_at__gte=timezone.make_aware(datetime.combine(start_day, time.min)),
+        created_at__lt=timezone.make_aware(datetime.combine(end_day + timedelta(days=1), time.min)),
+    ).annotate(
+        period=Trunc('created_at', granularity, output_field=DateField())
+    )
+
+    series = {}
+
+    def period_entry(period):
+        if period not in series:
+            series[period] = {'period': period.isoformat(), 'revenue': 0, 'units': 0, 'orders': 0}
+            if by_product:
+                series[period]['products'] = []
+        return series[period]
+
+    for row in sales.values('period').annotate(units=Sum('units'), revenue=Sum('revenue')).order_by():
+        entry = period_entry(row['period'])
+        entry['units'] = row['units']
+        entry['revenue'] = str(row['revenue'])
+
+    for row in orders.values('period').annotate(count=Count('id')).order_by():
+        period_entry(row['period'])['orders'] = row['count']
+
+    if by_product:
+        per_product = sales.values('period', 'product_id', 'product__name').annotate(
+            units=Sum('units'), revenue=Sum('revenue')
+        ).order_by('period', '-revenue')
+        for row in per_product:
+            series[row['period']]['products'].append({
+                'product_id': row['product_id'],
+                'name': row['product__name'],
+                'units': row['units'],
+                'revenue': str(row['revenue']),
+            })
+
+    return {
+        'granularity': granularity,
+        'start_date': start_day.isoformat(),
+        'end_date': end_day.isoformat(),
+        'series': [series[period] for period in sorted(series)],
+    }
+
+
+def cached_sales_timeseries(granularity, start_day, end_day, by_product=False):
+    version = cache_version(SALES_ANALYTICS_VERSION)
+    key = f"sales-analytics:{version}:{granularity}:{start_day}:{end_day}:{int(by_product)}"
+    data = cache.get(key)
+    if data is None:
+        data = sales_timeseries(granularity, start_day, end_day, by_product)
+        cache.set(key, data, SALES_ANALYTICS_TIMEOUT)
+    return data
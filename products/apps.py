@@ -6,4 +6,4 @@ class ProductsConfig(AppConfig):
     name = 'products'
 
     def ready(self):
-         import products.signals
\ No newline at end of file
+        import products.signals  # noqa
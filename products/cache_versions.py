@@ -0,0 +1,53 @@
+"""
+Contadores de versión para invalidar cachés: las entradas se guardan bajo la versión vigente y
+subirla las deja huérfanas. La fuente de verdad es la base, así que una escritura hecha en
+cualquier proceso (worker de Stripe, reportes, otro worker de gunicorn) se ve en todos. Con una
+caché compartida (REDIS_URL) la versión se lee de la caché y solo se consulta la base si falta;
+con la LocMem de cada proceso se lee siempre de la base.
+"""
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import CacheVersion
+
+# acota cuánto puede durar una copia vieja si una lectura se cruza con una subida
+VERSION_CACHE_TIMEOUT = 60
+
+
+def _cache_key(name):
+    return f'cache-version:{name}'
+
+
+def cache_version(name):
+    if settings.CACHE_IS_SHARED:
+        version = cache.get(_cache_key(name))
+        if version is not None:
+            return version
+
+    version = CacheVersion.objects.filter(name=name).values_list('version', flat=True).first() or 0
+    if settings.CACHE_IS_SHARED:
+        cache.add(_cache_key(name), version, VERSION_CACHE_TIMEOUT)
+    return version
+
+
+def _bump(name):
+    if not CacheVersion.objects.filter(name=name).update(version=F('version') + 1):
+        try:
+            with transaction.atomic():
+                CacheVersion.objects.create(name=name, version=1)
+        except IntegrityError:
+            CacheVersion.objects.filter(name=name).update(version=F('version') + 1)
+    # la próxima lectura toma la versión nueva de la base
+    cache.delete(_cache_key(name))
+
+
+def bump_cache_version(name):
+    """
+    Sube la versión al confirmarse la transacción actual: el UPDATE va en su propia transacción
+    corta, así las órdenes concurrentes no se serializan esperando el bloqueo de la fila.
+    """
+    transaction.on_commit(partial(_bump, name))
@@ -0,0 +1,52 @@
+"""
+Caché de las respuestas del catálogo. Toda escritura sobre productos sube un contador de versión
+(al confirmarse la transacción); las páginas serializadas se guardan bajo la versión vigente y la
+visibilidad (staff o cliente), así que invalidar es solo subir el número y las entradas viejas
+expiran solas. La misma versión sirve de ETag para responder 304 sin consultar productos. El
+contador es compartido entre procesos (products.cache_versions); con Redis un 304 no toca la base.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.http import HttpResponseNotModified
+from rest_framework.response import Response
+
+from .cache_versions import bump_cache_version, cache_version
+
+CATALOG_VERSION = 'catalog'
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
+
+def catalog_version():
+    return cache_version(CATALOG_VERSION)
+
+
+def bump_catalog_version():
+    """Invalida el catálogo cacheado una vez confirmada la transacción que cambió productos."""
+    bump_cache_version(CATALOG_VERSION)
+
+
+def cached_catalog_response(request, build):
+    """
+    Respuesta de catálogo cacheada para `request`; `build()` arma los datos cuando no están en
+    caché. Con un If-None-Match vigente devuelve 304 sin llamar a `build`.
+    """
+    version = catalog_version()
+    visibility = 'staff' if request.user.is_staff else 'cliente'
+    etag = f'"catalogo-{version}-{visibility}"'
+
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponseNotModified()
+    else:
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        key = f'catalog:{version}:{visibility}:{path}'
+        data = cache.get(key)
+        if data is None:
+            data = build()
+            cache.set(key, data, CATALOG_CACHE_TIMEOUT)
+        response = Response(data)
+
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    response['Vary'] = 'Authorization'
+    return response
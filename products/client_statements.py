@@ -0,0 +1,142 @@
+import multiprocessing
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+
+from django.utils import timezone
+
+from orders.models import Order
+from .statement_render import render_statement
+
+
+def previous_month():
+    first_of_month = timezone.localdate().replace(day=1)
+    end = first_of_month - timedelta(days=1)
+    return end.replace(day=1), end
+
+
+def _period_orders(start_day, end_day):
+    return Order.objects.filter(
+        created_at__gte=timezone.make_aware(datetime.combine(start_day, time.min)),
+        created_at__lt=timezone.make_aware(datetime.combine(end_day + timedelta(days=1), time.min)),
+    )
+
+
+def count_statements(start_day, end_day):
+    """Cantidad de estados de cuenta del período (clientes con órdenes)."""
+    return _period_orders(start_day, end_day).values('client_id').distinct().count()
+
+
+def load_statements(start_day, end_day, export_format, chunk_size=5000):
+    """
+    Estados de cuenta de todos los clientes con órdenes en el período, armados desde una sola
+    consulta (órdenes + líneas + cliente) ordenada por cliente y leída por bloques: se genera
+    un dict por cliente sin tener el período completo en memoria.
+    """
+    rows = _period_orders(start_day, end_day).order_by('client_id', 'id', 'items__id').values_list(
+        'client_id', 'client__correo', 'id', 'created_at', 'status', 'total_price',
+        'items__product__name', 'items__quantity', 'items__unit_price',
+    ).iterator(chunk_size=chunk_size)
+
+    for (client_id, correo), client_rows in groupby(rows, key=itemgetter(0, 1)):
+        orders, items = [], []
+        total = Decimal('0')
+        current_order = None
+        for _, _, order_id, created_at, status, total_price, product_name, quantity, unit_price in client_rows:
+            if order_id != current_order:
+                current_order = order_id
+                total += total_price
+                orders.append([order_id, timezone.localtime(created_at).strftime("%d/%m/%Y %H:%M"),
+                               status, f"${total_price}"])
+            if product_name is not None:
+                price = unit_price or Decimal('0')
+                items.append([order_id, product_name, f"${price}", quantity, f"${price * quantity}"])
+
+        yield {
+            'client_id': client_id,
+            'title': f"Estado de cuenta {correo} ({start_day:%d/%m/%Y} - {end_day:%d/%m/%Y})",
+            'filename': f"cliente_{client_id}_{start_day:%Y%m%d}_{end_day:%Y%m%d}",
+            'format': export_format,
+            'orders': orders,
+            'items': items,
+            'total': f"${total}",
+        }
+
+
+class _ZipStream:
+    """Destino de escritura para ZipFile que acumula lo escrito hasta que se lo vacía."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_statements_zip(statements, workers=None):
+    """
+    Dibuja los estados de cuenta en un pool de procesos y va generando los bytes del ZIP a
+    medida que cada documento termina. Como mucho hay 2 documentos por proceso en vuelo, así
+    que la memoria no depende de la cantidad de clientes.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    sink = _ZipStream()
+    # la consulta se sigue leyendo mientras trabaja el pool; los procesos nuevos no usan la base
+    context = multiprocessing.get_context('spawn')
+
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        pending = set()
+        statements = iter(statements)
+        exhausted = False
+
+        while pending or not exhausted:
+            while not exhausted and len(pending) < workers * 2:
+                statement = next(statements, None)
+                if statement is None:
+                    exhausted = True
+                else:
+                    pending.add(executor.submit(render_statement, statement))
+
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                filename, content = future.result()
+                archive.writestr(filename, content)
+            data = sink.drain()
+            if data:
+                yield data
+
+    yield sink.drain()
+
+
+def render_statements_zip(statements, progress=None, total=None):
+    """
+    Como `stream_statements_zip`, pero dibujando en el proceso actual: lo usa el trabajo en
+    segundo plano, que ya corre en un proceso del pool de `run_report_jobs`.
+    """
+    sink = _ZipStream()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for done, statement in enumerate(statements, 1):
+            filename, content = render_statement(statement)
+            archive.writestr(filename, content)
+            if progress:
+                progress(done, total)
+            data = sink.drain()
+            if data:
+                yield data
+
+    yield sink.drain()
@@ -0,0 +1,39 @@
+import resource
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+from products.pdf_tables import write_table_pdf
+
+
+def synthetic_rows(count):
+    start = datetime(2025, 1, 1)
+    for i in range(count):
+        yield [i + 1, (start + timedelta(minutes=i)).strftime("%d/%m/%Y %H:%M"), 'entregada', f"${(i % 997) + 0.5:.2f}"]
+
+
+class Command(BaseCommand):
+    help = ('Mide el tiempo, el tamaño y la memoria de generar el PDF de tabla paginada con '
+            'filas sintéticas (por defecto 10k, 100k y 1M filas). No toca la base de datos.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('sizes', nargs='*', type=int, default=[10_000, 100_000, 1_000_000])
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'filas':>10} {'páginas':>8} {'segundos':>9} {'filas/s':>9} {'MB':>8} {'RSS máx MB':>11}")
+        for count in options['sizes']:
+            with tempfile.TemporaryFile() as out:
+                started = time.perf_counter()
+                writer = write_table_pdf(out, f"Benchmark {count} filas", ["ID", "Fecha", "Estado", "Total"],
+                                         synthetic_rows(count))
+                elapsed = time.perf_counter() - started
+                size = out.tell()
+
+            # ru_maxrss está en KB en Linux; es el pico del proceso, así que conviene correr de menor a mayor
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            self.stdout.write(
+                f"{count:>10} {writer.pages:>8} {elapsed:>9.2f} {count / elapsed:>9.0f} "
+                f"{size / 1_048_576:>8.1f} {peak:>11.1f}"
+            )
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.client_statements import load_statements, previous_month, stream_statements_zip
+
+
+class Command(BaseCommand):
+    help = ('Genera el estado de cuenta de cada cliente con órdenes en el período (por defecto, el mes '
+            'anterior) y los guarda en un ZIP, dibujándolos en paralelo.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Ruta del archivo ZIP a generar')
+        parser.add_argument('--start', help='Primer día (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Último día (YYYY-MM-DD)')
+        parser.add_argument('--format', choices=['pdf', 'excel'], default='pdf')
+        parser.add_argument('--workers', type=int, default=None, help='Procesos (por defecto, uno por núcleo)')
+
+    def handle(self, *args, **options):
+        start, end = previous_month()
+        try:
+            if options['start']:
+                start = datetime.strptime(options['start'], '%Y-%m-%d').date()
+            if options['end']:
+                end = datetime.strptime(options['end'], '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError('Formato de fecha inválido. Use YYYY-MM-DD.')
+
+        count = 0
+
+        def counted(statements):
+            nonlocal count
+            for statement in statements:
+                count += 1
+                yield statement
+
+        statements = counted(load_statements(start, end, options['format']))
+        with open(options['output'], 'wb') as out:
+            for chunk in stream_statements_zip(statements, options['workers']):
+                out.write(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f'{count} estados de cuenta ({start} a {end}) en {options["output"]}.'))
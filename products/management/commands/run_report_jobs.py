@@ -0,0 +1,76 @@
+import multiprocessing
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from products.report_jobs import claim_report_jobs, mark_failed, release_report_jobs, run_report_job
+
+# veces que un trabajo puede estar en curso cuando se rompe el pool antes de darlo por fallido
+MAX_CRASHES = 3
+
+
+class Command(BaseCommand):
+    help = 'Genera los reportes encolados en /api/report-jobs/ usando un pool de procesos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Reportes generados en paralelo')
+        parser.add_argument('--poll-interval', type=float, default=2.0)
+        parser.add_argument('--once', action='store_true', help='Procesa lo pendiente y termina')
+
+    def handle(self, *args, **options):
+        self.crashes = Counter()
+        while not self.run_pool(options):
+            self.stderr.write('Un proceso del pool terminó inesperadamente; se crea un pool nuevo')
+
+    def run_pool(self, options):
+        """Procesa trabajos hasta terminar (--once). Devuelve False si el pool se rompió."""
+        workers = options['workers']
+        running = {}
+
+        # spawn: cada proceso arranca Django desde cero y abre su propia conexión
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=django.setup) as executor:
+            while True:
+                free = workers - len(running)
+                job_ids = claim_report_jobs(free, exclude=running.values()) if free else []
+                try:
+                    for job_id in job_ids:
+                        running[executor.submit(run_report_job, job_id)] = job_id
+                except BrokenProcessPool:
+                    self.requeue(set(running.values()) | set(job_ids))
+                    return False
+
+                if not running:
+                    if options['once']:
+                        return True
+                    connections.close_all()
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                if any(isinstance(future.exception(), BrokenProcessPool) for future in done):
+                    # no se sabe qué trabajo mató al proceso: todos los que estaban en curso vuelven a la cola
+                    self.requeue(running.values())
+                    return False
+                for future in done:
+                    job_id = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        # el proceso murió antes de poder registrar el error
+                        mark_failed(job_id, str(error))
+                    self.stdout.write(f'Reporte {job_id} terminado')
+
+    def requeue(self, job_ids):
+        released = []
+        for job_id in job_ids:
+            self.crashes[job_id] += 1
+            if self.crashes[job_id] >= MAX_CRASHES:
+                mark_failed(job_id, 'El proceso que generaba el reporte terminó inesperadamente.')
+            else:
+                released.append(job_id)
+        release_report_jobs(released)
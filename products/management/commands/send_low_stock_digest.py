@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from products.catalog import bump_catalog_version
+from products.models import Product
+from users.models import Usuario
+from users.utils import queue_email
+
+
+class Command(BaseCommand):
+    help = ('Envía a los administradores un único resumen con los productos en stock bajo. '
+            'Pensado para correr periódicamente (cron / scheduler).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--always', action='store_true',
+                            help='Envía el resumen aunque no haya productos nuevos desde el último')
+
+    def handle(self, *args, **options):
+        products = list(
+            Product.objects.filter(low_stock_since__isnull=False, is_active=True)
+            .order_by('stock', 'name')
+            .values('id', 'name', 'stock', 'low_stock_notified_at')
+        )
+        new_ids = [p['id'] for p in products if p['low_stock_notified_at'] is None]
+
+        if not new_ids and not options['always']:
+            self.stdout.write('Sin productos nuevos en stock bajo.')
+            return
+
+        recipients = list(
+            Usuario.objects.filter(rol=1, is_active=True).exclude(correo='').values_list('correo', flat=True)
+        )
+        if recipients:
+            lines = [
+                f"- {p['name']}: {p['stock']} unidades{' (nuevo)' if p['low_stock_notified_at'] is None else ''}"
+                for p in products
+            ]
+            message = (
+                f"Estimado Administrador,\n\n"
+                f"Los siguientes productos tienen stock bajo:\n\n"
+                + "\n".join(lines) +
+                f"\n\nPor favor, considere reabastecerlos lo antes posible.\n\n"
+                f"SmartCart System"
+            )
+            queue_email(recipients, f"Resumen de stock bajo: {len(products)} productos", message)
+
+        if new_ids:
+            now = timezone.now()
+            Product.objects.filter(id__in=new_ids).update(low_stock_notified_at=now, updated_at=now)
+            bump_catalog_version()
+        self.stdout.write(f'Resumen con {len(products)} productos ({len(new_ids)} nuevos) para {len(recipients)} administradores.')
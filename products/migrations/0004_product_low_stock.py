@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 05:03
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_low_stock(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Product.objects.filter(stock__lt=settings.LOW_STOCK_THRESHOLD).update(low_stock_since=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_discount_percentage_product_has_discount_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='low_stock_notified_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='low_stock_since',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('low_stock_since__isnull', False)), fields=['low_stock_since'], name='product_low_stock_idx'),
+        ),
+        migrations.RunPython(mark_low_stock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 05:26
+
+import django.db.models.expressions
+import django.db.models.functions.math
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_updated_at_tombstone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='final_price',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(discount_percentage__gt=0, has_discount=True, then=django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('price'), '-', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('price'), '*', models.F('discount_percentage')), '/', models.Value(100))), 2)), default=models.F('price')), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        # no se puede alterar una columna común a generada: se reemplaza (se recalcula desde stock)
+        migrations.RemoveField(
+            model_name='product',
+            name='is_available',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='is_available',
+            field=models.GeneratedField(db_persist=True, expression=models.Q(('stock__gt', 0)), output_field=models.BooleanField()),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['final_price', 'id'], name='product_final_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('discount_percentage__gt', 0), ('has_discount', True)), fields=['-id'], name='product_discounted_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 05:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_cacheversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportjob',
+            name='report_type',
+            field=models.CharField(choices=[('client', 'Reporte de cliente'), ('top_products', 'Productos más vendidos'), ('statements', 'Estados de cuenta')], max_length=30),
+        ),
+    ]
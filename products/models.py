@@ -1,4 +1,27 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import Case, F, Q, When
+from django.db.models.functions import Round
+from django.utils import timezone
+
+
+RELATED_PREVIEW_SIZE = 3
+
+
+class ProductQuerySet(models.QuerySet):
+    def with_related_preview(self):
+        """
+        Precarga en `related_preview` los primeros productos relacionados activos y disponibles
+        de cada producto (una sola consulta con ventana por producto) y los ids de todos los
+        relacionados para el campo `related_products`: dos consultas para toda la página.
+        """
+        related = Product.objects.filter(is_active=True, is_available=True).order_by('id').only(
+            'id', 'name', 'price', 'final_price'
+        )
+        return self.prefetch_related(
+            models.Prefetch('related_products', queryset=related[:RELATED_PREVIEW_SIZE], to_attr='related_preview'),
+            models.Prefetch('related_products', queryset=Product.objects.only('id')),
+        )
 
 
 class Product(models.Model):
@@ -7,29 +30,139 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField()
     is_active = models.BooleanField(default=True)
-    is_available = models.BooleanField(default=True)
+    # columnas generadas: las mantiene la base en cada INSERT/UPDATE, también en los .update() con F()
+    is_available = models.GeneratedField(
+        expression=Q(stock__gt=0), output_field=models.BooleanField(), db_persist=True,
+    )
     created_at = models.DateTimeField(auto_now_add=True)
+    # marca de la sincronización incremental (/api/products/changes/); los .update() deben ponerla a mano
+    updated_at = models.DateTimeField(auto_now=True)
 
     has_discount = models.BooleanField(default=False)
     discount_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    final_price = models.GeneratedField(
+        expression=Case(
+            When(has_discount=True, discount_percentage__gt=0,
+                 then=Round(F('price') - F('price') * F('discount_percentage') / 100, 2)),
+            default=F('price'),
+        ),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+    )
 
 
     related_products = models.ManyToManyField('self', blank=True, symmetrical=False,
                                               related_name='recommended_for')
 
-    @property
-    def final_price(self):
-        if self.has_discount and self.discount_percentage > 0:
-            discount = (self.price * self.discount_percentage) / 100
-            return round(self.price - discount, 2)
-        return self.price
+    # cuándo cruzó el umbral de stock bajo y cuándo salió en un resumen; se limpian al reponer
+    low_stock_since = models.DateTimeField(null=True, blank=True, editable=False)
+    low_stock_notified_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['low_stock_since'], name='product_low_stock_idx',
+                         condition=Q(low_stock_since__isnull=False)),
+            models.Index(fields=['updated_at', 'id'], name='product_updated_at_idx'),
+            models.Index(fields=['final_price', 'id'], name='product_final_price_idx'),
+            models.Index(fields=['-id'], name='product_discounted_idx',
+                         condition=Q(has_discount=True, discount_percentage__gt=0)),
+        ]
 
     def save(self, *args, **kwargs):
-        if self.stock <= 0:
-            self.is_available = False
-        else:
-            self.is_available = True
+        adding = self._state.adding
+        changed = set()
+        if self.stock < settings.LOW_STOCK_THRESHOLD:
+            if self.low_stock_since is None:
+                self.low_stock_since = timezone.now()
+                self.low_stock_notified_at = None
+                changed |= {'low_stock_since', 'low_stock_notified_at'}
+        elif self.low_stock_since is not None:
+            self.low_stock_since = None
+            self.low_stock_notified_at = None
+            changed |= {'low_stock_since', 'low_stock_notified_at'}
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'updated_at', *(changed if 'stock' in update_fields else ())}
         super().save(*args, **kwargs)
 
+        # el INSERT devuelve las columnas generadas, el UPDATE no: se descartan para que se
+        # recarguen de la base la próxima vez que se lean
+        if not adding:
+            for field in self._meta.concrete_fields:
+                if field.generated:
+                    self.__dict__.pop(field.attname, None)
+
     def __str__(self):
         return self.name
+
+
+class ReportJob(models.Model):
+    REPORT_TYPES = (
+        ('client', 'Reporte de cliente'),
+        ('top_products', 'Productos más vendidos'),
+        ('statements', 'Estados de cuenta'),
+    )
+    FORMATS = (
+        ('pdf', 'PDF'),
+        ('excel', 'Excel'),
+    )
+    STATUS_CHOICES = (
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('listo', 'Listo'),
+        ('fallido', 'Fallido'),
+    )
+    IN_FLIGHT = ('pendiente', 'procesando')
+
+    report_type = models.CharField(max_length=30, choices=REPORT_TYPES)
+    format = models.CharField(max_length=10, choices=FORMATS)
+    params = models.JSONField(default=dict)
+    # sha256 de (tipo, formato, parámetros): dos pedidos iguales en curso comparten el trabajo
+    params_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendiente')
+    progress = models.PositiveSmallIntegerField(default=0)
+    file = models.FileField(upload_to='reports/%Y/%m/', blank=True)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='report_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['params_hash'], condition=Q(status__in=['pendiente', 'procesando']),
+                                    name='unique_in_flight_report_job'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='report_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.report_type} {self.format} ({self.status})"
+
+
+class CacheVersion(models.Model):
+    """Contador de versión de una caché (ver products.cache_versions)."""
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class ProductTombstone(models.Model):
+    """Producto borrado, para que la sincronización incremental se lo informe a los clientes."""
+    product_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at'], name='product_tombstone_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} ({self.deleted_at})"
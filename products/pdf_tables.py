@@ -0,0 +1,138 @@
+"""
+Tablas PDF grandes dibujadas directamente sobre el canvas de reportlab.
+
+A diferencia de platypus (`Table` + `TableStyle`), acá no se calcula el layout de toda la tabla
+antes de dibujar: se consume un iterable de filas de a una página por vez, se repite el encabezado
+en cada página y la memoria por página queda acotada aunque las filas sean millones. No depende
+de Django, así se puede usar desde procesos de trabajo o desde el benchmark.
+"""
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+MARGIN = 40
+TITLE_SIZE = 16
+HEADER_FONT = 'Helvetica-Bold'
+BODY_FONT = 'Helvetica'
+
+
+def _fit(text, width, font, size):
+    """Recorta el texto para que entre en la celda (con '…' si hizo falta)."""
+    # ningún glifo de Helvetica mide más que el tamaño de letra: los textos cortos no se miden
+    if len(text) * size <= width or stringWidth(text, font, size) <= width:
+        return text
+    while text and stringWidth(text + '…', font, size) > width:
+        text = text[:-1]
+    return text + '…'
+
+
+class TablePDFWriter:
+    """
+    Escribe una tabla paginada en `out` (archivo o buffer). Uso:
+
+        writer = TablePDFWriter(out, "Título", ["ID", "Fecha", ...])
+        writer.write_rows(filas)   # cualquier iterable, se consume una sola vez
+        writer.close()
+    """
+
+    def __init__(self, out, title, headings, col_widths=None, pagesize=letter, font_size=9, row_padding=4):
+        self.title = title
+        self.headings = [str(h) for h in headings]
+        self.pagesize = pagesize
+        self.font_size = font_size
+        self.row_height = font_size + 2 * row_padding
+        self.header_height = self.row_height + 2
+
+        page_width, page_height = pagesize
+        usable = page_width - 2 * MARGIN
+        if col_widths is None:
+            col_widths = [usable / len(self.headings)] * len(self.headings)
+        else:
+            scale = usable / sum(col_widths)
+            col_widths = [w * scale for w in col_widths]
+        self.col_widths = col_widths
+        self.col_x = [MARGIN + sum(col_widths[:i]) for i in range(len(col_widths))]
+        self.table_width = sum(col_widths)
+
+        self.top = page_height - MARGIN
+        self.first_page_top = self.top - TITLE_SIZE - 14
+        self.bottom = MARGIN
+
+        self.canvas = canvas.Canvas(out, pagesize=pagesize, pageCompression=1)
+        self.pages = 0
+        self.rows_written = 0
+        self._y = None
+        self._page_top = None
+        self._text = None
+
+    def _start_page(self):
+        c = self.canvas
+        if self.pages:
+            self._finish_page()
+            c.showPage()
+        self.pages += 1
+
+        y = self.top
+        if self.pages == 1:
+            c.setFont(HEADER_FONT, TITLE_SIZE)
+            c.drawString(MARGIN, y - TITLE_SIZE, self.title)
+            y = self.first_page_top
+
+        self._page_top = y
+        c.setFillColor(colors.grey)
+        c.rect(MARGIN, y - self.header_height, self.table_width, self.header_height, stroke=0, fill=1)
+        self._text = c.beginText()
+        self._text.setFillColor(colors.whitesmoke)
+        self._text.setFont(HEADER_FONT, self.font_size + 1)
+        self._draw_cells(self.headings, y - self.header_height, HEADER_FONT, self.font_size + 1)
+        self._text.setFillColor(colors.black)
+        self._text.setFont(BODY_FONT, self.font_size)
+        self._y = y - self.header_height
+
+    def _draw_cells(self, values, y, font, size):
+        # un único objeto de texto por página: crear uno por celda (drawCentredString) es lo caro
+        text_object = self._text
+        text_y = y + (self.row_height - size) / 2 + 1
+        for value, x, width in zip(values, self.col_x, self.col_widths):
+            text = _fit('' if value is None else str(value), width - 6, font, size)
+            text_object.setTextOrigin(x + (width - stringWidth(text, font, size)) / 2, text_y)
+            text_object.textOut(text)
+
+    def _finish_page(self):
+        """Vuelca el texto y dibuja la grilla de la página de una vez (no un rect por celda)."""
+        c = self.canvas
+        c.drawText(self._text)
+        c.setStrokeColor(colors.black)
+        c.setLineWidth(0.5)
+        top, bottom = self._page_top, self._y
+        xs = self.col_x + [MARGIN + self.table_width]
+        ys = [top, top - self.header_height]
+        y = top - self.header_height
+        while y - self.row_height >= bottom - 0.01:
+            y -= self.row_height
+            ys.append(y)
+        c.grid(xs, ys)
+
+    def write_rows(self, rows):
+        for row in rows:
+            if self._y is None or self._y - self.row_height < self.bottom:
+                self._start_page()
+            self._y -= self.row_height
+            self._draw_cells(row, self._y, BODY_FONT, self.font_size)
+            self.rows_written += 1
+
+    def close(self):
+        if self._y is None:
+            self._start_page()
+        self._finish_page()
+        self.canvas.showPage()
+        self.canvas.save()
+
+
+def write_table_pdf(out, title, headings, rows, **options):
+    """Atajo: escribe la tabla completa y devuelve el writer (páginas y filas escritas)."""
+    writer = TablePDFWriter(out, title, headings, **options)
+    writer.write_rows(rows)
+    writer.close()
+    return writer
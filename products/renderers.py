@@ -0,0 +1,38 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .simple_reports import EXCEL_CONTENT_TYPE
+
+
+class FileRenderer(BaseRenderer):
+    """
+    Las vistas de reportes devuelven el archivo ya armado; estos renderers existen para que DRF
+    acepte ?format=pdf / excel / csv / ndjson en la negociación en vez de responder 404. Los errores
+    de DRF (401/403) se siguen devolviendo como JSON.
+    """
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return JSONRenderer().render(data)
+
+
+class PDFRenderer(FileRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+
+
+class ExcelRenderer(FileRenderer):
+    media_type = EXCEL_CONTENT_TYPE
+    format = 'excel'
+
+
+class CSVRenderer(FileRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(FileRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
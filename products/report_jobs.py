@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import tempfile
+from datetime import date, datetime, timedelta
+from itertools import chain
+
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .client_statements import count_statements, load_statements, render_statements_zip
+from .models import ReportJob
+from .simple_reports import ClientReportGenerator, TopProductsReportGenerator
+
+logger = logging.getLogger(__name__)
+
+
+class ReportJobError(Exception):
+    """El reporte no se puede generar con esos parámetros (por ejemplo, no hay datos)."""
+
+
+def params_hash(report_type, report_format, params):
+    key = json.dumps([report_type, report_format, params], sort_keys=True, default=str)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def submit_report_job(report_type, report_format, params, user=None):
+    """
+    Encola un reporte. Si ya hay uno idéntico pendiente o en proceso se devuelve ese en lugar de
+    crear otro; el índice único parcial cubre la carrera entre dos pedidos simultáneos.
+    Devuelve (job, created).
+    """
+    digest = params_hash(report_type, report_format, params)
+    existing = ReportJob.objects.filter(params_hash=digest, status__in=ReportJob.IN_FLIGHT).first()
+    if existing:
+        return existing, False
+    try:
+        with transaction.atomic():
+            job = ReportJob.objects.create(
+                report_type=report_type, format=report_format, params=params,
+                params_hash=digest, requested_by=user,
+            )
+        return job, True
+    except IntegrityError:
+        return ReportJob.objects.get(params_hash=digest, status__in=ReportJob.IN_FLIGHT), False
+
+
+def claim_report_jobs(limit, stale_after=timedelta(minutes=30), exclude=()):
+    """
+    Marca como 'procesando' hasta `limit` trabajos (SKIP LOCKED) y devuelve sus ids. Un trabajo en
+    proceso se vuelve a tomar si su locked_at (que el avance va renovando) quedó más viejo que
+    `stale_after`; `exclude` son los ids que el que llama ya está generando.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            ReportJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='pendiente') | Q(status='procesando', locked_at__lt=now - stale_after))
+            .exclude(id__in=list(exclude))
+            .order_by('created_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        ReportJob.objects.filter(id__in=ids).update(status='procesando', locked_at=now, progress=0)
+    return ids
+
+
+def release_report_jobs(job_ids):
+    """Devuelve a la cola trabajos reclamados que no llegaron a terminar."""
+    ReportJob.objects.filter(id__in=job_ids, status='procesando').update(status='pendiente', locked_at=None, progress=0)
+
+
+def _as_datetime(value):
+    return datetime.strptime(value, '%Y-%m-%d') if value else None
+
+
+def _render_statements(job, progress):
+    start_day = date.fromisoformat(job.params['start_date'])
+    end_day = date.fromisoformat(job.params['end_date'])
+    statements = load_statements(start_day, end_day, job.format)
+    first = next(statements, None)
+    if first is None:
+        return HttpResponse(status=404), None
+
+    total = count_statements(start_day, end_day)
+    response = StreamingHttpResponse(
+        render_statements_zip(chain([first], statements), progress, total), content_type='application/zip'
+    )
+    return response, f"estados_de_cuenta_{start_day:%Y%m%d}_{end_day:%Y%m%d}.zip"
+
+
+def _render(job, progress):
+    if job.report_type == 'statements':
+        return _render_statements(job, progress)
+
+    params = job.params
+    start_date, end_date = _as_datetime(params.get('start_date')), _as_datetime(params.get('end_date'))
+
+    if job.report_type == 'client':
+        generator = ClientReportGenerator()
+        generator.progress = progress
+        args = (params['client_id'], start_date, end_date)
+        filename = f"cliente_{params['client_id']}_reporte"
+    else:
+        generator = TopProductsReportGenerator()
+        args = (start_date, end_date, params.get('limit', 10))
+        filename = "productos_mas_vendidos"
+
+    if job.format == 'excel':
+        return generator.generate_excel_report(*args), f"{filename}.xlsx"
+    return generator.generate_pdf_report(*args), f"{filename}.pdf"
+
+
+def run_report_job(job_id):
+    """
+    Genera el archivo de un trabajo ya reclamado y lo guarda en el storage. Corre en un proceso
+    del pool de `run_report_jobs`; el avance se va guardando para que el cliente lo consulte.
+    """
+    job = ReportJob.objects.get(pk=job_id)
+
+    def progress(done, total):
+        # locked_at hace de latido: mientras avanza, claim_report_jobs no lo da por abandonado
+        changes = {'locked_at': timezone.now()}
+        if total:
+            changes['progress'] = min(90, 5 + 85 * done // total)
+        ReportJob.objects.filter(pk=job_id, status='procesando').update(**changes)
+
+    try:
+        ReportJob.objects.filter(pk=job_id).update(progress=5, locked_at=timezone.now())
+        response, filename = _render(job, progress)
+        if response is None:
+            raise ReportJobError('No se pudo generar el reporte.')
+        if response.status_code == 404:
+            raise ReportJobError('No hay datos para el período seleccionado.')
+
+        with tempfile.TemporaryFile() as tmp:
+            for chunk in response:
+                tmp.write(chunk)
+            response.close()
+            tmp.seek(0)
+            job.file.save(filename, File(tmp), save=False)
+
+        ReportJob.objects.filter(pk=job_id).update(
+            file=job.file.name, status='listo', progress=100, error='', locked_at=None, finished_at=timezone.now()
+        )
+    except ReportJobError as e:
+        logger.warning(f"Reporte {job_id} sin generar: {e}")
+        mark_failed(job_id, str(e))
+    except Exception as e:
+        logger.exception(f"Error generando el reporte {job_id}")
+        mark_failed(job_id, str(e))
+
+
+def mark_failed(job_id, error):
+    ReportJob.objects.filter(pk=job_id).update(
+        status='fallido', error=error, locked_at=None, finished_at=timezone.now()
+    )
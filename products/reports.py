@@ -1,6 +1,6 @@
 from django.db.models import Count, Sum
 from django.db.models.functions import TruncMonth
-from orders.models import Order, OrderItem
+from orders.models import Order, ProductDailySales
 from datetime import datetime, timedelta
 import os
 import logging
@@ -37,7 +37,7 @@ except ImportError as e:
 
 def generate_client_report(client_id, start_date=None, end_date=None):
     try:
-        orders = Order.objects.filter(user_id=client_id)
+        orders = Order.objects.filter(client_id=client_id).prefetch_related('items__product')
 
         if start_date:
             orders = orders.filter(created_at__gte=start_date)
@@ -48,19 +48,18 @@ def generate_client_report(client_id, start_date=None, end_date=None):
 
         orders_data = []
         for order in orders:
-            items = OrderItem.objects.filter(order=order)
             orders_data.append({
                 'id': order.id,
                 'date': order.created_at,
-                'total': order.total,
+                'total': order.total_price,
                 'status': order.status,
                 'items': [
                     {
                         'product': item.product.name,
-                        'price': item.price,
+                        'price': item.sold_price,
                         'quantity': item.quantity,
-                        'subtotal': item.price * item.quantity
-                    } for item in items
+                        'subtotal': item.sold_price * item.quantity
+                    } for item in order.items.all()
                 ]
             })
 
@@ -78,18 +77,16 @@ def generate_client_report(client_id, start_date=None, end_date=None):
 
 def generate_top_products_report(start_date=None, end_date=None, limit=10):
     try:
-        query = OrderItem.objects.values('product__id', 'product__name')
+        query = ProductDailySales.objects.values('product__id', 'product__name')
 
         if start_date:
-            query = query.filter(order__created_at__gte=start_date)
+            query = query.filter(day__gte=start_date.date())
         if end_date:
-
-            end_of_day = datetime.combine(end_date.date(), datetime.max.time())
-            query = query.filter(order__created_at__lte=end_of_day)
+            query = query.filter(day__lte=end_date.date())
 
         top_products = query.annotate(
-            total_sold=Sum('quantity'),
-            total_revenue=Sum('price')
+            total_sold=Sum('units'),
+            total_revenue=Sum('revenue')
         ).order_by('-total_sold')[:limit]
 
         return {
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Product
+from .client_statements import previous_month
+from .models import RELATED_PREVIEW_SIZE, Product, ReportJob
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -8,9 +9,16 @@ class ProductSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Product
-        fields = '__all__'
+        # marcas internas del resumen de stock bajo; se ven en el admin
+        exclude = ('low_stock_since', 'low_stock_notified_at')
 
     def get_related_products_info(self, obj):
+        # los listados los traen con Product.objects.with_related_preview(); si no, una consulta por producto
+        related = getattr(obj, 'related_preview', None)
+        if related is None:
+            related = obj.related_products.filter(
+                is_active=True, is_available=True
+            ).order_by('id')[:RELATED_PREVIEW_SIZE]
 
         return [
             {
@@ -18,7 +26,56 @@ class ProductSerializer(serializers.ModelSerializer):
                 'name': product.name,
                 'price': product.price,
                 'final_price': product.final_price
-            } for product in obj.related_products.filter(
-                is_active=True, is_available=True
-            )[:3]
+            } for product in related
         ]
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = ('id', 'report_type', 'format', 'params', 'status', 'progress', 'error',
+                  'created_at', 'finished_at', 'download_url')
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != 'listo':
+            return None
+        request = self.context.get('request')
+        url = f"/api/report-jobs/{obj.id}/download/"
+        return request.build_absolute_uri(url) if request else url
+
+
+class ReportJobCreateSerializer(serializers.Serializer):
+    report_type = serializers.ChoiceField(choices=ReportJob.REPORT_TYPES)
+    format = serializers.ChoiceField(choices=ReportJob.FORMATS, default='pdf')
+    client_id = serializers.IntegerField(required=False)
+    start_date = serializers.DateField(required=False, allow_null=True)
+    end_date = serializers.DateField(required=False, allow_null=True)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=1000)
+
+    def validate(self, attrs):
+        if attrs['report_type'] == 'client' and 'client_id' not in attrs:
+            raise serializers.ValidationError({'client_id': 'Se requiere un ID de cliente.'})
+        if attrs.get('start_date') and attrs.get('end_date') and attrs['start_date'] > attrs['end_date']:
+            raise serializers.ValidationError({'end_date': 'La fecha final es anterior a la inicial.'})
+        return attrs
+
+    def job_params(self):
+        """Parámetros normalizados: los mismos datos dan siempre el mismo dict (y el mismo hash)."""
+        data = self.validated_data
+        params = {
+            'start_date': data['start_date'].isoformat() if data.get('start_date') else None,
+            'end_date': data['end_date'].isoformat() if data.get('end_date') else None,
+        }
+        if data['report_type'] == 'client':
+            params['client_id'] = data['client_id']
+        elif data['report_type'] == 'statements':
+            # sin fechas, el mes anterior; se fijan acá para que el mismo período dé el mismo hash
+            start_day, end_day = previous_month()
+            params['start_date'] = params['start_date'] or start_day.isoformat()
+            params['end_date'] = params['end_date'] or end_day.isoformat()
+        else:
+            params['limit'] = data.get('limit', 10)
+        return params
@@ -1,31 +1,28 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.conf import settings
-from pyexpat.errors import messages
+from django.utils import timezone
+
+from .catalog import bump_catalog_version
+from .models import Product, ProductTombstone
 
-from users.models import Usuario
-from .models import Product
 
 @receiver(post_save, sender=Product)
-def notify_low_stock(sender,instance, **kwargs):
-    if instance.stock < 5:
-        admins = Usuario.objects.filter(rol=1,is_active=True)
-        recipient_list=[admin.correo for admin in admins if admin.correo]
+@receiver(post_delete, sender=Product)
+def invalidate_catalog(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_delete, sender=Product)
+def record_tombstone(sender, instance, **kwargs):
+    ProductTombstone.objects.create(product_id=instance.pk)
 
-        if recipient_list:
-            subject = f"Stock bajo para el producto: {instance.name}"
-            message = (
-                f"Estimado Administrador,\n\n"
-                f"El producto '{instance.name}' tiene un stock bajo de {instance.stock} unidades.\n"
-                f"Por favor, considere reabastecerlo lo antes posible.\n\n"
-                f"SmartCart System"
-            )
 
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                recipient_list,
-                fail_silently=False,
-            )
+@receiver(m2m_changed, sender=Product.related_products.through)
+def invalidate_catalog_on_related_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        # cambia `related_products` del producto de origen, que tiene que volver a sincronizarse
+        if not reverse:
+            Product.objects.filter(pk=instance.pk).update(updated_at=timezone.now())
+        elif pk_set:
+            Product.objects.filter(pk__in=pk_set).update(updated_at=timezone.now())
+        bump_catalog_version()
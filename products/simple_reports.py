@@ -1,85 +1,69 @@
-from io import BytesIO
 from decimal import Decimal
 from datetime import datetime
+from itertools import chain
 import logging
-
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
+import tempfile
 
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font
 
-from django.http import HttpResponse
-from orders.models import Order, OrderItem
+from django.http import FileResponse, HttpResponse
+from orders.exports import streaming_export
+from orders.models import Order, ProductDailySales
+from .pdf_tables import write_table_pdf
 
 logger = logging.getLogger(__name__)
 
+EXCEL_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
 
 class ReportGenerator:
+    chunk_size = 2000
+    # callable(filas_hechas, total_filas) opcional; lo usan los trabajos de reportes para informar avance
+    progress = None
+
+    def header_row(self, ws, headings):
+        row = []
+        for header in headings:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = Font(bold=True)
+            row.append(cell)
+        return row
+
+    def excel_response(self, wb, filename):
+        """Guarda el libro (write-only) en un archivo temporal y lo envía por bloques."""
+        tmp = tempfile.TemporaryFile()
+        wb.save(tmp)
+        tmp.seek(0)
+        return FileResponse(tmp, as_attachment=True, filename=f"{filename}.xlsx", content_type=EXCEL_CONTENT_TYPE)
 
-    
     def generate_pdf(self, title, headings, data, filename):
+        """`data` puede ser una lista o un generador de filas: se dibuja página por página."""
         try:
-            buffer = BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=letter)
-            elements = []
-            
-
-            styles = getSampleStyleSheet()
-            title_style = styles['Heading1']
-            
-
-            elements.append(Paragraph(title, title_style))
-            elements.append(Spacer(1, 20))
-            
-
-            table_data = [headings] + data
-            t = Table(table_data)
-            t.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ]))
-            
-            elements.append(t)
-            doc.build(elements)
-            
-            buffer.seek(0)
-            response = HttpResponse(buffer, content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="{filename}.pdf"'
-            return response
+            tmp = tempfile.TemporaryFile()
+            write_table_pdf(tmp, title, headings, data)
+            tmp.seek(0)
+            return FileResponse(tmp, as_attachment=True, filename=f"{filename}.pdf", content_type='application/pdf')
         except Exception as e:
             logger.exception(f"Error generando PDF: {str(e)}")
             return None
-    
+
+    def generate_stream(self, fields, rows, export_format, filename, compress=False):
+        """CSV / NDJSON: las filas se escriben mientras se leen, sin armar el archivo en memoria."""
+        first = next(rows, None)
+        if first is None:
+            return HttpResponse("No hay datos para el período seleccionado", status=404)
+        return streaming_export(fields, chain([first], rows), export_format, filename, compress)
+
     def generate_excel(self, headings, data, filename):
         try:
-            wb = Workbook()
-            ws = wb.active
-            
-
-            for col_idx, header in enumerate(headings, 1):
-                cell = ws.cell(row=1, column=col_idx, value=header)
-                cell.font = Font(bold=True)
-            
-
-            for row_idx, row_data in enumerate(data, 2):
-                for col_idx, value in enumerate(row_data, 1):
-                    ws.cell(row=row_idx, column=col_idx, value=value)
-
-            response = HttpResponse(
-                buffer.getvalue(),
-                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
-            response['Content-Disposition'] = f'attachment; filename="{filename}.xlsx"'
-            return response
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet()
+            ws.append(self.header_row(ws, headings))
+            for row_data in data:
+                ws.append(row_data)
+            return self.excel_response(wb, filename)
         except Exception as e:
             logger.exception(f"Error generando Excel: {str(e)}")
             return None
@@ -87,42 +71,61 @@ class ReportGenerator:
 
 class ClientReportGenerator(ReportGenerator):
 
-    
-    def get_report_data(self, client_id, start_date=None, end_date=None):
+    def get_orders(self, client_id, start_date=None, end_date=None):
         orders = Order.objects.filter(client_id=client_id)
-        
+
         if start_date:
             orders = orders.filter(created_at__gte=start_date)
         if end_date:
             end_of_day = datetime.combine(end_date.date(), datetime.max.time())
             orders = orders.filter(created_at__lte=end_of_day)
-        
+        return orders
+
+    def get_report_rows(self, client_id, start_date=None, end_date=None):
+        """
+        Órdenes del cliente unidas a sus líneas en una sola consulta, ordenadas por orden y
+        leídas por bloques: (order_id, fecha, estado, total, producto, cantidad, precio de la venta).
+        Las órdenes sin líneas vienen una vez con producto None.
+        """
+        return self.get_orders(client_id, start_date, end_date).order_by('id', 'items__id').values_list(
+            'id', 'created_at', 'status', 'total_price', 'items__product__name', 'items__quantity', 'items__unit_price'
+        ).iterator(chunk_size=self.chunk_size)
+
+    def generate_stream_report(self, client_id, start_date=None, end_date=None, export_format='csv', compress=False):
+        fields = ['order_id', 'created_at', 'status', 'total_price', 'product', 'quantity', 'unit_price']
+        rows = self.get_report_rows(client_id, start_date, end_date)
+        return self.generate_stream(fields, rows, export_format, f"cliente_{client_id}_reporte", compress)
+
+    def iter_report(self, client_id, start_date=None, end_date=None):
+        """Recorre las filas una vez y emite ('order', fila) al empezar cada orden e ('item', fila) por línea."""
+        total = None
+        if self.progress:
+            total = self.get_orders(client_id, start_date, end_date).values('id', 'items__id').count()
+
+        current_order = None
+        rows = self.get_report_rows(client_id, start_date, end_date)
+        for done, (order_id, created_at, status, total_price, product_name, quantity, item_price) in enumerate(rows, 1):
+            if self.progress and done % self.chunk_size == 0:
+                self.progress(done, total)
+            if order_id != current_order:
+                current_order = order_id
+                yield 'order', [order_id, created_at.strftime("%d/%m/%Y %H:%M"), status, f"${total_price}"], total_price
+            if product_name is not None:
+                item_price = item_price or Decimal('0')
+                yield 'item', [order_id, product_name, f"${item_price}", quantity, f"${item_price * quantity}"], None
+
+    def get_report_data(self, client_id, start_date=None, end_date=None):
         orders_data = []
         items_data = []
         total_spent = Decimal('0')
-        
-        for order in orders:
-            order_row = [
-                order.id, 
-                order.created_at.strftime("%d/%m/%Y %H:%M"), 
-                order.status, 
-                f"${order.total_price}"
-            ]
-            orders_data.append(order_row)
-            total_spent += order.total_price
-            
-            items = OrderItem.objects.filter(order=order)
-            for item in items:
-                item_price = item.product.final_price
-                subtotal = item_price * item.quantity
-                items_data.append([
-                    order.id,
-                    item.product.name,
-                    f"${item_price}",
-                    item.quantity,
-                    f"${subtotal}"
-                ])
-        
+
+        for kind, row, total_price in self.iter_report(client_id, start_date, end_date):
+            if kind == 'order':
+                orders_data.append(row)
+                total_spent += total_price
+            else:
+                items_data.append(row)
+
         return {
             'client_id': client_id,
             'orders': orders_data,
@@ -132,102 +135,80 @@ class ClientReportGenerator(ReportGenerator):
         }
     
     def generate_pdf_report(self, client_id, start_date=None, end_date=None):
-        data = self.get_report_data(client_id, start_date, end_date)
-        
-        title = f"Reporte de Cliente {client_id}"
-        if not data['orders']:
+        orders = self.get_orders(client_id, start_date, end_date).order_by('id').values_list(
+            'id', 'created_at', 'status', 'total_price'
+        ).iterator(chunk_size=self.chunk_size)
+        first = next(orders, None)
+        if first is None:
             return HttpResponse("No hay datos para este cliente en el período seleccionado", status=404)
-        
 
-        orders_headings = ["ID", "Fecha", "Estado", "Total"]
+        total = self.get_orders(client_id, start_date, end_date).count() if self.progress else None
 
-        orders_data = data['orders'] + [["", "", "TOTAL", f"${data['total_spent']}"]]
-        
-        return self.generate_pdf(title, orders_headings, orders_data, f"cliente_{client_id}_reporte")
+        def rows():
+            total_spent = Decimal('0')
+            for done, (order_id, created_at, status, total_price) in enumerate(chain([first], orders), 1):
+                if self.progress and done % self.chunk_size == 0:
+                    self.progress(done, total)
+                total_spent += total_price
+                yield [order_id, created_at.strftime("%d/%m/%Y %H:%M"), status, f"${total_price}"]
+            yield ["", "", "TOTAL", f"${total_spent}"]
+
+        title = f"Reporte de Cliente {client_id}"
+        orders_headings = ["ID", "Fecha", "Estado", "Total"]
+        return self.generate_pdf(title, orders_headings, rows(), f"cliente_{client_id}_reporte")
     
     def generate_excel_report(self, client_id, start_date=None, end_date=None):
-        data = self.get_report_data(client_id, start_date, end_date)
-        
-        if not data['orders']:
+        """
+        Escribe las dos hojas en una sola pasada con openpyxl en modo write-only, así la memoria
+        no crece con la cantidad de órdenes: cada hoja se va volcando a disco mientras se recorre.
+        """
+        rows = self.iter_report(client_id, start_date, end_date)
+        first = next(rows, None)
+        if first is None:
             return HttpResponse("No hay datos para este cliente en el período seleccionado", status=404)
-        
-        wb = Workbook()
-        
-
-        ws_orders = wb.active
-        ws_orders.title = "Órdenes"
-        
-
-        headers = ["ID", "Fecha", "Estado", "Total"]
-        for col_idx, header in enumerate(headers, 1):
-            cell = ws_orders.cell(row=1, column=col_idx, value=header)
-            cell.font = Font(bold=True)
-        
-
-        for row_idx, order_data in enumerate(data['orders'], 2):
-            for col_idx, value in enumerate(order_data, 1):
-                ws_orders.cell(row=row_idx, column=col_idx, value=value)
-        
 
-        total_row = row_idx + 1
-        ws_orders.cell(row=total_row, column=3, value="TOTAL")
-        ws_orders.cell(row=total_row, column=4, value=f"${data['total_spent']}")
-        
+        wb = Workbook(write_only=True)
+        ws_orders = wb.create_sheet(title="Órdenes")
+        ws_orders.append(self.header_row(ws_orders, ["ID", "Fecha", "Estado", "Total"]))
+        ws_items = None
 
-        if data['items']:
-            ws_items = wb.create_sheet(title="Detalles")
-            
-
-            headers = ["Orden ID", "Producto", "Precio", "Cantidad", "Subtotal"]
-            for col_idx, header in enumerate(headers, 1):
-                cell = ws_items.cell(row=1, column=col_idx, value=header)
-                cell.font = Font(bold=True)
-            
-
-            for row_idx, item_data in enumerate(data['items'], 2):
-                for col_idx, value in enumerate(item_data, 1):
-                    ws_items.cell(row=row_idx, column=col_idx, value=value)
+        total_spent = Decimal('0')
+        for kind, row, total_price in chain([first], rows):
+            if kind == 'order':
+                ws_orders.append(row)
+                total_spent += total_price
+            else:
+                if ws_items is None:
+                    ws_items = wb.create_sheet(title="Detalles")
+                    ws_items.append(self.header_row(ws_items, ["Orden ID", "Producto", "Precio", "Cantidad", "Subtotal"]))
+                ws_items.append(row)
 
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
+        ws_orders.append([None, None, "TOTAL", f"${total_spent}"])
 
-        filename = f"cliente_{client_id}_reporte.xlsx"
-        response = HttpResponse(
-            buffer.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        # Forma correcta de establecer el Content-Disposition
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
+        return self.excel_response(wb, f"cliente_{client_id}_reporte")
 
 
 class TopProductsReportGenerator(ReportGenerator):
 
     
-    def get_report_data(self, start_date=None, end_date=None, limit=10):
-        from django.db.models import Sum, F, ExpressionWrapper, DecimalField
-        
-        query = OrderItem.objects.values('product__id', 'product__name')
-        
+    def get_report_query(self, start_date=None, end_date=None, limit=10):
+        from django.db.models import Sum
+
+        query = ProductDailySales.objects.values('product__id', 'product__name')
+
         if start_date:
-            query = query.filter(order__created_at__gte=start_date)
+            query = query.filter(day__gte=start_date.date())
         if end_date:
-            end_of_day = datetime.combine(end_date.date(), datetime.max.time())
-            query = query.filter(order__created_at__lte=end_of_day)
-        
-        top_products = query.annotate(
-            total_sold=Sum('quantity'),
-            total_revenue=Sum(
-                ExpressionWrapper(
-                    F('product__price') * F('quantity'),
-                    output_field=DecimalField()
-                )
-            )
+            query = query.filter(day__lte=end_date.date())
+
+        return query.annotate(
+            total_sold=Sum('units'),
+            total_revenue=Sum('revenue')
         ).order_by('-total_sold')[:limit]
-        
+
+    def get_report_data(self, start_date=None, end_date=None, limit=10):
         products_data = []
-        for product in top_products:
+        for product in self.get_report_query(start_date, end_date, limit):
             products_data.append([
                 product['product__id'],
                 product['product__name'],
@@ -237,6 +218,14 @@ class TopProductsReportGenerator(ReportGenerator):
         
         return products_data
     
+    def generate_stream_report(self, start_date=None, end_date=None, limit=10, export_format='csv', compress=False):
+        fields = ['product_id', 'product', 'total_sold', 'total_revenue']
+        rows = (
+            [p['product__id'], p['product__name'], p['total_sold'], p['total_revenue']]
+            for p in self.get_report_query(start_date, end_date, limit)
+        )
+        return self.generate_stream(fields, rows, export_format, "productos_mas_vendidos", compress)
+
     def generate_pdf_report(self, start_date=None, end_date=None, limit=10):
         data = self.get_report_data(start_date, end_date, limit)
         
@@ -0,0 +1,49 @@
+"""
+Dibujo de los estados de cuenta por cliente. No importa Django: se ejecuta en los procesos del
+pool de `client_statements` y recibe solo datos ya cargados (listas y strings).
+"""
+from io import BytesIO
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+from .pdf_tables import write_table_pdf
+
+ORDER_HEADINGS = ["ID", "Fecha", "Estado", "Total"]
+ITEM_HEADINGS = ["Orden ID", "Producto", "Precio", "Cantidad", "Subtotal"]
+
+
+def _header(ws, headings):
+    cells = []
+    for header in headings:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = Font(bold=True)
+        cells.append(cell)
+    return cells
+
+
+def render_statement(statement):
+    """Devuelve (nombre de archivo, bytes) para el dict armado por `client_statements.load_statements`."""
+    out = BytesIO()
+    total_row = ["", "", "TOTAL", statement['total']]
+
+    if statement['format'] == 'excel':
+        wb = Workbook(write_only=True)
+        ws_orders = wb.create_sheet(title="Órdenes")
+        ws_orders.append(_header(ws_orders, ORDER_HEADINGS))
+        for row in statement['orders']:
+            ws_orders.append(row)
+        ws_orders.append(total_row)
+        if statement['items']:
+            ws_items = wb.create_sheet(title="Detalles")
+            ws_items.append(_header(ws_items, ITEM_HEADINGS))
+            for row in statement['items']:
+                ws_items.append(row)
+        wb.save(out)
+        extension = 'xlsx'
+    else:
+        write_table_pdf(out, statement['title'], ORDER_HEADINGS, statement['orders'] + [total_row])
+        extension = 'pdf'
+
+    return f"{statement['filename']}.{extension}", out.getvalue()
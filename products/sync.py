@@ -0,0 +1,77 @@
+"""
+Sincronización incremental del catálogo. El token es la posición (updated_at, id) hasta la que el
+cliente ya tiene los productos; cada respuesta trae los productos modificados después de esa
+posición, los ids que el cliente tiene que borrar (productos eliminados o que dejó de ver) y el
+token siguiente. Solo se entregan cambios de hasta hace CATALOG_SYNC_LAG segundos, para que una
+transacción lenta que confirma con un updated_at anterior no quede detrás de un token ya entregado.
+"""
+import base64
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.utils import timezone
+
+from .models import Product, ProductTombstone
+
+# lo que ve un cliente en /api/products/; el staff ve todo. Un producto que se desactiva o se
+# queda sin stock le llega al cliente como borrado en la próxima sincronización
+CUSTOMER_VISIBLE = Q(is_active=True, is_available=True)
+
+
+class InvalidSyncToken(Exception):
+    pass
+
+
+def encode_token(updated_at, product_id=None):
+    raw = f"{updated_at.isoformat()}|{product_id or ''}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_token(token):
+    try:
+        updated_at, product_id = base64.urlsafe_b64decode(token.encode()).decode().split('|')
+        updated_at = datetime.fromisoformat(updated_at)
+        product_id = int(product_id) if product_id else None
+    except (ValueError, UnicodeError):
+        raise InvalidSyncToken(token)
+    if timezone.is_naive(updated_at):
+        raise InvalidSyncToken(token)
+    return updated_at, product_id
+
+
+def catalog_changes(token=None, staff=False, limit=500):
+    """
+    Devuelve (productos modificados, ids a borrar, token siguiente, hay_más). Sin token devuelve el
+    catálogo completo, en páginas de `limit` como cualquier otra sincronización.
+    """
+    upper = timezone.now() - timedelta(seconds=getattr(settings, 'CATALOG_SYNC_LAG', 5))
+    products = Product.objects.with_related_preview().filter(updated_at__lte=upper)
+    tombstones = ProductTombstone.objects.filter(deleted_at__lte=upper)
+
+    if token:
+        since, since_id = decode_token(token)
+        after = Q(updated_at__gt=since)
+        if since_id is not None:
+            after |= Q(updated_at=since, id__gt=since_id)
+        products = products.filter(after)
+        tombstones = tombstones.filter(deleted_at__gt=since)
+
+    if not staff:
+        products = products.annotate(visible=ExpressionWrapper(CUSTOMER_VISIBLE, output_field=BooleanField()))
+
+    page = list(products.order_by('updated_at', 'id')[:limit + 1])
+    has_more = len(page) > limit
+    if has_more:
+        page = page[:limit]
+        last = page[-1]
+        # la página corta en el último producto; los borrados se entregan hasta ese mismo instante
+        tombstones = tombstones.filter(deleted_at__lte=last.updated_at)
+        next_token = encode_token(last.updated_at, last.id)
+    else:
+        next_token = encode_token(upper)
+
+    changed = [product for product in page if staff or product.visible]
+    removed = [product.id for product in page if not (staff or product.visible)]
+    removed += tombstones.values_list('product_id', flat=True)
+    return changed, removed, next_token, has_more
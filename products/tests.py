@@ -1,3 +1,130 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import Usuario
+from .models import Product, ReportJob
+from .report_jobs import claim_report_jobs
+from .sync import catalog_changes
+
+
+class ProductListQueriesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(Usuario.objects.create_user('cliente@test.com', 'Cliente', 'Test', 'pw'))
+
+    def create_products(self, count):
+        products = Product.objects.bulk_create([
+            Product(name=f'Producto {i}', price=Decimal('10.00'), stock=5,
+                    has_discount=i % 2 == 0, discount_percentage=Decimal('10') if i % 2 == 0 else 0)
+            for i in range(count)
+        ])
+        for product in products:
+            product.related_products.set(products[:5])
+        return products
+
+    def test_list_query_count_does_not_grow_with_page_size(self):
+        self.create_products(40)
+
+        # versión del catálogo + página + vista previa de relacionados + ids de relacionados
+        with self.assertNumQueries(4):
+            small = self.client.get('/api/products/?page_size=5')
+        with self.assertNumQueries(4):
+            large = self.client.get('/api/products/?page_size=40')
+
+        self.assertEqual(len(small.data['results']), 5)
+        self.assertEqual(len(large.data['results']), 40)
+
+    def test_ordering_by_non_unique_field_pages_every_product_once(self):
+        products = Product.objects.bulk_create([
+            Product(name=f'Producto {i}', price=Decimal('10.00'), stock=5) for i in range(7)
+        ])
+
+        seen = []
+        url = '/api/products/?ordering=price&page_size=2'
+        while url:
+            response = self.client.get(url)
+            seen += [item['id'] for item in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(seen, [p.pk for p in products])
+
+    def test_related_products_info_is_limited_and_filtered(self):
+        products = self.create_products(6)
+        Product.objects.filter(pk=products[0].pk).update(is_active=False)
+
+        response = self.client.get(f'/api/products/{products[5].pk}/')
+
+        self.assertNotIn('low_stock_since', response.data)
+        related = response.data['related_products_info']
+        self.assertEqual([item['id'] for item in related], [p.pk for p in products[1:4]])
+        self.assertEqual(related[1]['final_price'], Decimal('9.00'))
+
+
+@override_settings(CACHE_IS_SHARED=True)
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(Usuario.objects.create_user('cliente@test.com', 'Cliente', 'Test', 'pw'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = Product.objects.create(name='Leche', price=Decimal('10.00'), stock=5)
+
+    def test_conditional_get_returns_304_without_queries(self):
+        first = self.client.get('/api/products/')
+        self.assertEqual(first.status_code, 200)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/products/')
+            not_modified = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(cached.data, first.data)
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_product_write_invalidates_catalog(self):
+        first = self.client.get('/api/products/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = Decimal('12.00')
+            self.product.save()
+
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response.data['results'][0]['price'], '12.00')
+
+
+class ClaimReportJobsTests(TestCase):
+    def create_job(self, locked_minutes_ago):
+        return ReportJob.objects.create(
+            report_type='top_products', format='pdf', params_hash=str(locked_minutes_ago),
+            status='procesando', locked_at=timezone.now() - timedelta(minutes=locked_minutes_ago),
+        )
+
+    def test_running_jobs_are_not_reclaimed(self):
+        stale = self.create_job(40)
+        self.create_job(1)
+
+        self.assertEqual(claim_report_jobs(5, exclude=[stale.id]), [])
+        self.assertEqual(claim_report_jobs(5), [stale.id])
+
+
+@override_settings(CATALOG_SYNC_LAG=0)
+class CatalogSyncTests(TestCase):
+    def test_deactivated_product_is_deleted_for_customers(self):
+        product = Product.objects.create(name='Leche', price=Decimal('10.00'), stock=5)
+        changed, removed, token, _ = catalog_changes()
+        self.assertEqual([p.id for p in changed], [product.id])
+
+        product.is_active = False
+        product.save()
+
+        changed, removed, _, _ = catalog_changes(token)
+        self.assertEqual(changed, [])
+        self.assertEqual(removed, [product.id])
+        self.assertEqual([p.id for p in catalog_changes(token, staff=True)[0]], [product.id])
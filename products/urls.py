@@ -1,13 +1,16 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
-    ProductViewSet, simple_client_report_view, simple_top_products_report_view
+    ProductViewSet, simple_client_report_view, simple_top_products_report_view, sales_analytics_view,
+    client_statements_view
 )
 
 
 urlpatterns = [
     path('simple-reports/client/', simple_client_report_view, name='simple-client-report'),
     path('simple-reports/top-products/', simple_top_products_report_view, name='simple-top-products-report'),
+    path('analytics/sales/', sales_analytics_view, name='sales-analytics'),
+    path('simple-reports/statements/', client_statements_view, name='client-statements'),
 ]
 
 
@@ -1,26 +1,44 @@
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 
 from django.contrib.auth.decorators import login_required
-from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view, permission_classes
+from django.shortcuts import get_object_or_404
+from rest_framework import mixins, viewsets, status
+from rest_framework.decorators import action, api_view, permission_classes, renderer_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from .models import Product
-from .serializers import ProductSerializer
+from .models import Product, ReportJob
+from .serializers import ProductSerializer, ReportJobSerializer, ReportJobCreateSerializer
+from .report_jobs import submit_report_job
 from .permissions import IsStaffOrSuperUser
+from .renderers import CSVRenderer, ExcelRenderer, NDJSONRenderer, PDFRenderer
+from .catalog import bump_catalog_version, cached_catalog_response
+from .sync import CUSTOMER_VISIBLE, InvalidSyncToken, catalog_changes
 from orders.models import Cart
-from django.http import HttpResponse
-from datetime import datetime
+from SmartCartBackend.pagination import IdTiebreakOrderingFilter
+from django.http import FileResponse, HttpResponse
+from datetime import datetime, timedelta
+from django.utils import timezone
 import logging
 from .simple_reports import ClientReportGenerator, TopProductsReportGenerator
+from .analytics import SALES_GRANULARITIES, cached_sales_timeseries
+from .client_statements import previous_month
 
 logger = logging.getLogger(__name__)
 
 
 class ProductViewSet(viewsets.ModelViewSet):
+    """
+    Catálogo. Filtros: ?min_price= y ?max_price= (sobre el precio con descuento), ?discounted=true;
+    orden con ?ordering= (final_price, -final_price, price, name, created_at).
+    """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
+    filter_backends = [IdTiebreakOrderingFilter]
+    ordering_fields = ['final_price', 'price', 'name', 'created_at', 'id']
+    ordering = ['-id']
 
     def check_permissions(self, request):
         super().check_permissions(request)
@@ -29,10 +47,31 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        queryset = Product.objects.with_related_preview()
+        params = self.request.query_params
+
+        try:
+            if params.get('min_price'):
+                queryset = queryset.filter(final_price__gte=Decimal(params['min_price']))
+            if params.get('max_price'):
+                queryset = queryset.filter(final_price__lte=Decimal(params['max_price']))
+        except InvalidOperation:
+            raise ValidationError({"error": "Rango de precios inválido."})
+        if params.get('discounted', '').lower() in ('1', 'true'):
+            queryset = queryset.filter(has_discount=True, discount_percentage__gt=0)
+
         if user.is_authenticated and user.is_staff:
-            return Product.objects.all()
+            return queryset
+
+        return queryset.filter(CUSTOMER_VISIBLE)
 
-        return Product.objects.filter(is_available=True, stock__gt=0)
+    def list(self, request, *args, **kwargs):
+        return cached_catalog_response(request, lambda: super(ProductViewSet, self).list(request, *args, **kwargs).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_catalog_response(
+            request, lambda: super(ProductViewSet, self).retrieve(request, *args, **kwargs).data
+        )
 
     @action(detail=True, methods=['post'])
     def apply_discount(self, request, pk=None):
@@ -83,8 +122,10 @@ class ProductViewSet(viewsets.ModelViewSet):
             decimal_discount = Decimal(discount_str)
             count = products.update(
                 discount_percentage=decimal_discount,
-                has_discount=discount > 0
+                has_discount=discount > 0,
+                updated_at=timezone.now()
             )
+            bump_catalog_version()
             return Response({
                 "message": f"Descuento del {discount}% aplicado a {count} productos"
             })
@@ -94,6 +135,27 @@ class ProductViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Cambios del catálogo desde ?since=<token> (sin token, el catálogo completo). Se sigue
+        pidiendo con `next` mientras `has_more` sea true y se guarda el último `next`.
+        """
+        try:
+            limit = min(int(request.GET.get('limit', 500)), 1000)
+            changed, removed, next_token, has_more = catalog_changes(
+                request.GET.get('since'), staff=request.user.is_staff, limit=max(limit, 1)
+            )
+        except (InvalidSyncToken, ValueError):
+            return Response({"error": "Token o límite inválido."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'changed': ProductSerializer(changed, many=True).data,
+            'deleted': removed,
+            'next': next_token,
+            'has_more': has_more,
+        })
+
     @action(detail=False, methods=['get'])
     def recommendations(self, request):
         user = request.user
@@ -104,15 +166,15 @@ class ProductViewSet(viewsets.ModelViewSet):
 
         try:
             cart = Cart.objects.get(user=user)
-            cart_products = [item.product for item in cart.items.all()]
+            cart_products = [item.product for item in cart.items.select_related('product')]
 
             if not cart_products:
-                recommendations = Product.objects.filter(
+                recommendations = Product.objects.with_related_preview().filter(
                     is_active=True,
                     is_available=True
                 ).order_by('-id')[:5]
             else:
-                recommendations = Product.objects.filter(
+                recommendations = Product.objects.with_related_preview().filter(
                     is_active=True,
                     is_available=True,
                     recommended_for__in=cart_products
@@ -121,15 +183,54 @@ class ProductViewSet(viewsets.ModelViewSet):
             return Response(ProductSerializer(recommendations, many=True).data)
 
         except Cart.DoesNotExist:
-            recommendations = Product.objects.filter(
+            recommendations = Product.objects.with_related_preview().filter(
                 is_active=True,
                 is_available=True
             ).order_by('-id')[:5]
             return Response(ProductSerializer(recommendations, many=True).data)
 
 
+class ReportJobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin,
+                       viewsets.GenericViewSet):
+    """
+    Reportes en segundo plano: POST encola (o se une a un pedido idéntico en curso) y devuelve
+    el id; GET muestra estado y avance; /download/ entrega el archivo cuando está listo.
+    """
+    serializer_class = ReportJobSerializer
+    permission_classes = [IsStaffOrSuperUser]
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return ReportJob.objects.none()
+        return ReportJob.objects.filter(requested_by=self.request.user).order_by('-created_at')
+
+    def create(self, request, *args, **kwargs):
+        serializer = ReportJobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job, created = submit_report_job(
+            serializer.validated_data['report_type'], serializer.validated_data['format'],
+            serializer.job_params(), request.user,
+        )
+        data = ReportJobSerializer(job, context={'request': request}).data
+        return Response(data, status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK)
+
+    def retrieve(self, request, *args, **kwargs):
+        # un pedido idéntico de otro usuario comparte el trabajo, así que se busca entre todos
+        job = get_object_or_404(ReportJob, pk=kwargs['pk'])
+        return Response(ReportJobSerializer(job, context={'request': request}).data)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = get_object_or_404(ReportJob, pk=pk)
+        if job.status != 'listo' or not job.file:
+            return Response({"error": "El reporte todavía no está listo.", "status": job.status},
+                            status=status.HTTP_409_CONFLICT)
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=job.file.name.rsplit('/', 1)[-1])
+
+
 @api_view(['GET'])
 @permission_classes([IsStaffOrSuperUser])
+@renderer_classes([JSONRenderer, PDFRenderer, ExcelRenderer, CSVRenderer, NDJSONRenderer])
 def simple_client_report_view(request):
 
     try:
@@ -156,6 +257,9 @@ def simple_client_report_view(request):
 
         if report_format == 'excel':
             return report_generator.generate_excel_report(client_id, start_date, end_date)
+        elif report_format in ('csv', 'ndjson'):
+            return report_generator.generate_stream_report(client_id, start_date, end_date, report_format,
+                                                           compress=request.GET.get('gzip') in ('1', 'true'))
         else:  # Default is PDF
             return report_generator.generate_pdf_report(client_id, start_date, end_date)
 
@@ -166,6 +270,7 @@ def simple_client_report_view(request):
 
 @api_view(['GET'])
 @permission_classes([IsStaffOrSuperUser])
+@renderer_classes([JSONRenderer, PDFRenderer, ExcelRenderer, CSVRenderer, NDJSONRenderer])
 def simple_top_products_report_view(request):
 
     try:
@@ -190,9 +295,67 @@ def simple_top_products_report_view(request):
 
         if report_format == 'excel':
             return report_generator.generate_excel_report(start_date, end_date, limit)
+        elif report_format in ('csv', 'ndjson'):
+            return report_generator.generate_stream_report(start_date, end_date, limit, report_format,
+                                                           compress=request.GET.get('gzip') in ('1', 'true'))
         else:  # Default is PDF
             return report_generator.generate_pdf_report(start_date, end_date, limit)
 
     except Exception as e:
         logger.exception(f"Error inesperado en simple_top_products_report_view: {str(e)}")
         return HttpResponse(f"Error interno del servidor: {str(e)}", status=500)
+
+
+@api_view(['GET'])
+@permission_classes([IsStaffOrSuperUser])
+def sales_analytics_view(request):
+    """
+    Serie de ventas para dashboards: ?granularity=day|week|month&start_date=&end_date=&by_product=true.
+    Sin fechas devuelve los últimos 365 días.
+    """
+    granularity = request.GET.get('granularity', 'day').lower()
+    if granularity not in SALES_GRANULARITIES:
+        return Response({"error": "granularity debe ser day, week o month."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        end_date = datetime.strptime(request.GET['end_date'], '%Y-%m-%d').date() \
+            if request.GET.get('end_date') else timezone.localdate()
+        start_date = datetime.strptime(request.GET['start_date'], '%Y-%m-%d').date() \
+            if request.GET.get('start_date') else end_date - timedelta(days=364)
+    except ValueError:
+        return Response({"error": "Formato de fecha inválido. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+
+    if start_date > end_date:
+        return Response({"error": "start_date no puede ser posterior a end_date."}, status=status.HTTP_400_BAD_REQUEST)
+
+    by_product = request.GET.get('by_product', '').lower() in ('1', 'true', 'yes')
+    return Response(cached_sales_timeseries(granularity, start_date, end_date, by_product))
+
+
+@api_view(['GET'])
+@permission_classes([IsStaffOrSuperUser])
+@renderer_classes([JSONRenderer, PDFRenderer, ExcelRenderer])
+def client_statements_view(request):
+    """
+    Encola el ZIP con el estado de cuenta de cada cliente del período (por defecto, el mes
+    anterior) como un trabajo de /api/report-jobs/; el archivo se baja de su download_url.
+    """
+    report_format = request.GET.get('format', 'pdf').lower()
+    if report_format not in ('pdf', 'excel'):
+        return Response({"error": "format debe ser pdf o excel."}, status=status.HTTP_400_BAD_REQUEST)
+
+    start_date, end_date = previous_month()
+    try:
+        if request.GET.get('start_date'):
+            start_date = datetime.strptime(request.GET['start_date'], '%Y-%m-%d').date()
+        if request.GET.get('end_date'):
+            end_date = datetime.strptime(request.GET['end_date'], '%Y-%m-%d').date()
+    except ValueError:
+        return Response({"error": "Formato de fecha inválido. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+
+    params = {'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()}
+    job, created = submit_report_job('statements', report_format, params, request.user)
+    data = ReportJobSerializer(job, context={'request': request}).data
+    # ?format= elige el formato del ZIP; la respuesta es el trabajo encolado, en JSON
+    return Response(data, status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK,
+                    content_type='application/json')
@@ -1,12 +1,13 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import Usuario, Rol
+from .models import Usuario, Rol, EmailOutbox
 
 @admin.register(Usuario)
 class UsuarioAdmin(BaseUserAdmin):
     model = Usuario
-    list_display = ('id', 'correo', 'nombre', 'apellido', 'rol', 'is_active', 'is_staff')
+    list_display = ('id', 'correo', 'nombre', 'apellido', 'rol', 'order_count', 'total_spent', 'is_active', 'is_staff')
     list_filter = ('is_staff', 'is_superuser', 'is_active', 'rol')
+    list_select_related = ('rol', 'order_stats')
     search_fields = ('correo', 'nombre', 'apellido')
     ordering = ('id',)
     filter_horizontal = ()
@@ -23,6 +24,14 @@ class UsuarioAdmin(BaseUserAdmin):
          ),
     )
 
+    @admin.display(description='Órdenes', ordering='order_stats__order_count')
+    def order_count(self, obj):
+        return obj.order_stats.order_count if hasattr(obj, 'order_stats') else 0
+
+    @admin.display(description='Gasto total', ordering='order_stats__total_spent')
+    def total_spent(self, obj):
+        return obj.order_stats.total_spent if hasattr(obj, 'order_stats') else 0
+
     def save_model(self, request, obj, form, change):
 
         if obj.rol and obj.rol.nombre.lower() == 'administrador':
@@ -35,3 +44,11 @@ class UsuarioAdmin(BaseUserAdmin):
 class RolAdmin(admin.ModelAdmin):
     list_display = ('id', 'nombre')
     search_fields = ('nombre',)
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'recipient', 'subject', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('recipient', 'subject')
+    exclude = ('attachments',)
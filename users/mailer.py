@@ -0,0 +1,117 @@
+import base64
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+def claim_emails(batch_size, stale_after=timedelta(minutes=10)):
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status='pendiente', next_attempt_at__lte=now) |
+                Q(status='enviando', locked_at__lt=now - stale_after)
+            )
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        EmailOutbox.objects.filter(id__in=ids).update(status='enviando', locked_at=now)
+    return list(EmailOutbox.objects.filter(id__in=ids).order_by('id'))
+
+
+def _over_rate_limit(emails, max_per_recipient, window):
+    """Separa los correos cuyo destinatario ya recibió `max_per_recipient` en la ventana."""
+    if not max_per_recipient:
+        return emails, []
+
+    recipients = {email.recipient for email in emails}
+    sent = dict(
+        EmailOutbox.objects.filter(
+            recipient__in=recipients, status='enviado', sent_at__gte=timezone.now() - window
+        ).values('recipient').annotate(total=Count('id')).values_list('recipient', 'total')
+    )
+
+    allowed, deferred = [], []
+    for email in emails:
+        if sent.get(email.recipient, 0) >= max_per_recipient:
+            deferred.append(email)
+        else:
+            sent[email.recipient] = sent.get(email.recipient, 0) + 1
+            allowed.append(email)
+    return allowed, deferred
+
+
+def _build_message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=[email.recipient],
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    for attachment in email.attachments:
+        message.attach(attachment['filename'], base64.b64decode(attachment['content']), attachment['mimetype'])
+    return message
+
+
+def _reschedule(email, error, now, max_attempts, backoff_seconds):
+    attempts = email.attempts + 1
+    if attempts >= max_attempts:
+        logger.error(f"Correo {email.id} a {email.recipient} descartado tras {attempts} intentos: {error}")
+        changes = {'status': 'fallido'}
+    else:
+        delay = min(backoff_seconds * 2 ** (attempts - 1), 3600)
+        changes = {'status': 'pendiente', 'next_attempt_at': now + timedelta(seconds=delay)}
+    EmailOutbox.objects.filter(pk=email.pk).update(attempts=attempts, locked_at=None, last_error=str(error), **changes)
+
+
+def send_batch(emails, max_attempts=5, backoff_seconds=60, max_per_recipient=None, window=timedelta(hours=1)):
+    """Envía el lote por una sola conexión SMTP. Devuelve (enviados, reprogramados, fallidos)."""
+    now = timezone.now()
+    allowed, deferred = _over_rate_limit(emails, max_per_recipient, window)
+    if deferred:
+        EmailOutbox.objects.filter(id__in=[email.id for email in deferred]).update(
+            status='pendiente', locked_at=None, next_attempt_at=now + window / max_per_recipient
+        )
+    if not allowed:
+        return 0, len(deferred), 0
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        # servidor caído o credenciales inválidas: todo el lote cuenta el intento y espera su backoff
+        logger.warning(f"No se pudo abrir la conexión SMTP, se reprograman {len(allowed)} correos: {e}")
+        for email in allowed:
+            _reschedule(email, e, now, max_attempts, backoff_seconds)
+        return 0, len(deferred), len(allowed)
+
+    sent_ids, failed = [], 0
+    try:
+        for email in allowed:
+            try:
+                _build_message(email, connection).send()
+            except Exception as e:
+                failed += 1
+                _reschedule(email, e, now, max_attempts, backoff_seconds)
+            else:
+                sent_ids.append(email.id)
+    finally:
+        connection.close()
+        EmailOutbox.objects.filter(id__in=sent_ids).update(
+            status='enviado', locked_at=None, sent_at=timezone.now(), last_error=''
+        )
+
+    return len(sent_ids), len(deferred), failed
@@ -0,0 +1,35 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.mailer import claim_emails, send_batch
+
+
+class Command(BaseCommand):
+    help = 'Envía los correos de la bandeja de salida en lotes, reutilizando una conexión SMTP.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--backoff', type=int, default=60,
+                            help='Segundos de espera tras el primer fallo; se duplica en cada intento')
+        parser.add_argument('--poll-interval', type=float, default=5.0)
+        parser.add_argument('--once', action='store_true', help='Envía lo pendiente y termina')
+
+    def handle(self, *args, **options):
+        max_per_recipient = settings.EMAIL_OUTBOX_MAX_PER_RECIPIENT
+        window = timedelta(seconds=settings.EMAIL_OUTBOX_RATE_WINDOW)
+
+        while True:
+            emails = claim_emails(options['batch_size'])
+            if emails:
+                sent, deferred, failed = send_batch(
+                    emails, options['max_attempts'], options['backoff'], max_per_recipient, window
+                )
+                self.stdout.write(f'{sent} enviados, {deferred} reprogramados, {failed} con error')
+                continue
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
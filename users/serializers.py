@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Rol, Usuario
+from orders.serializers import ClientOrderStatsSerializer
 
 class RolSerializer(serializers.ModelSerializer):
     class Meta:
@@ -12,6 +13,7 @@ class UsuarioSerializer(serializers.ModelSerializer):
         source='rol',
         required=False
     )
+    order_stats = ClientOrderStatsSerializer(read_only=True)
 
     class Meta:
         model = Usuario
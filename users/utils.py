@@ -1,11 +1,30 @@
-from django.core.mail import send_mail
-from django.conf import settings
+import base64
+
+from .models import EmailOutbox
+
+
+def queue_email(recipients, subject, body='', html_body='', attachments=(), from_email=''):
+    """
+    Deja el correo en la bandeja de salida (una fila por destinatario) en lugar de enviarlo por
+    SMTP dentro de la petición; lo envía el comando `send_queued_emails`.
+    `attachments` es una lista de (nombre, contenido en bytes, mimetype).
+    """
+    encoded = [
+        {'filename': filename, 'mimetype': mimetype, 'content': base64.b64encode(content).decode('ascii')}
+        for filename, content, mimetype in attachments
+    ]
+    return EmailOutbox.objects.bulk_create([
+        EmailOutbox(
+            recipient=recipient,
+            subject=subject,
+            body=body,
+            html_body=html_body,
+            from_email=from_email or '',
+            attachments=encoded,
+        )
+        for recipient in recipients
+    ])
+
 
 def send_gmail_email(to_email, subject, html_content):
-    send_mail(
-        subject=subject,
-        message='',
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[to_email],
-        html_message=html_content,
-    )
\ No newline at end of file
+    queue_email([to_email], subject, html_body=html_content)
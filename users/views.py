@@ -10,6 +10,7 @@ from rest_framework.views import APIView
 from django.conf import settings
 from .models import Rol, Usuario
 from .serializers import RolSerializer, UsuarioSerializer
+from orders.serializers import ClientOrderStatsSerializer
 from .permissions import IsStaffOrSuperUser
 from rest_framework.response import Response
 from .utils import send_gmail_email
@@ -23,7 +24,7 @@ class RolViewSet(viewsets.ModelViewSet):
 
 
 class UsuarioViewSet(viewsets.ModelViewSet):
-    queryset = Usuario.objects.all()
+    queryset = Usuario.objects.select_related('rol', 'order_stats')
     serializer_class = UsuarioSerializer
     permission_classes = [IsStaffOrSuperUser]
 
@@ -151,5 +152,6 @@ class UserProfileView(APIView):
             'nombre': user.nombre,
             'apellido': user.apellido,
             'rol': user.rol.nombre if user.rol else None,
+            'order_stats': ClientOrderStatsSerializer(user.order_stats).data if hasattr(user, 'order_stats') else None,
         }
         return Response(data)